@@ -8,9 +8,8 @@ from uis import Ui_MainWindow, Ui_HowToUse, Ui_AboutAuthors, Ui_AboutCoolTypeInf
 import os
 import sys
 
-from cool import tokenizer
-from cool import CoolParser
-from cool.cmp import evaluate_reverse_parse
+from cool import CoolLexer, relex
+from cool import CoolParser, CoolSynchronizing
 from cool import FormatVisitor, TypeCollector, TypeBuilder, TypeChecker, TypeInferer
 
 class MainWindow(QMainWindow):
@@ -29,6 +28,8 @@ class MainWindow(QMainWindow):
         self.ui.actionAboutAuthors.triggered.connect(self.about_authors)
         self.ui.actionAboutCoolTypeInferer.triggered.connect(self.about_cool_type_inferer)
         
+        self.tokens = None
+        self.lexical_errors = []
         self.new_file()
 
 
@@ -107,19 +108,36 @@ class MainWindow(QMainWindow):
         self.close()
 
     
+    def tokenize(self, text):
+        # Only the edited part is lexed again when the previous tokens are known,
+        # and had no errors, since those are only found again where it is relexed
+        edit = self.ui.textCode.takeEdit()
+        lexer = CoolLexer()
+        if self.tokens is None or edit is None or self.lexical_errors or len(text) != len(self.tokens.source) + edit[2] - edit[1]:
+            self.tokens = lexer.stream(text)
+        else:
+            self.tokens = relex(self.tokens, text, *edit, lexer=lexer)
+        self.lexical_errors = lexer.errors
+        return self.tokens
+
     def analyse(self):
         text = self.ui.textCode.toPlainText()
         self.ui.textResults.setPlainText('')
-        tokens = tokenizer(text)
+        tokens = self.tokenize(text)
+        if self.lexical_errors:
+            self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}=============== LEXICAL ERRORS ================\n')
+            for error in self.lexical_errors:
+                self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}{error}\n')
         self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}================== PARSING ====================\n')
-        parse, operations = CoolParser(tokens)
-        if not operations:
-            self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}Unexpected token: {parse.lex} at Ln: {parse.line}, Col {parse.column}\n')
+        # the AST is built while parsing
+        ast, unexpected = CoolParser.evaluate(tokens)
+        if unexpected is not None:
+            # every syntax error is reported, not only the first one
+            for token in CoolParser.recover(tokens, CoolSynchronizing):
+                self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}Unexpected token: {token.lex} at Ln: {token.line}, Col {token.column}\n')
             return
         self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}Successful parsing!\n')
-        # print('\n'.join(repr(x) for x in parse))
         # self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}==================== AST ======================\n')
-        ast = evaluate_reverse_parse(parse, operations, tokens)
         formatter = FormatVisitor()
         tree = formatter.visit(ast)
         # self.ui.textResults.setPlainText(f'{self.ui.textResults.toPlainText()}{tree}\n')
@@ -1,4 +1,5 @@
 from .lexer import *
+from .dfa_lexer import DFALexer
 from .parser import *
 from .format_visitor import FormatVisitor
 from .type_collector import TypeCollector
@@ -0,0 +1,145 @@
+import multiprocessing
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from .cmp import Token
+from .lexer import CoolLexer
+from .parser import CoolParser, CoolSynchronizing, Node
+
+
+###### RESULTS ######
+
+class BatchResult:
+    """
+    Outcome of parsing one file.
+
+    `ast` is the program, or `None` if the file has syntax errors.
+    `lexical_errors` holds the `LexicalError`s of the file.
+    `syntax_errors` holds every unexpected token found in panic mode.
+    `error` is the message of the `OSError` raised if the file could not be
+    read, `None` otherwise.
+
+    Tokens keep the name of their type instead of the grammar terminal.
+    Terminals reach the whole grammar, and its semantic actions are lambdas,
+    so a result with them could not be pickled.
+    """
+
+    def __init__(self, path, ast, lexical_errors, syntax_errors, error=None):
+        self.path = path
+        self.ast = ast
+        self.lexical_errors = lexical_errors
+        self.syntax_errors = syntax_errors
+        self.error = error
+
+    @property
+    def ok(self):
+        return self.ast is not None and not self.lexical_errors and self.error is None
+
+    def __repr__(self):
+        if self.error is not None:
+            return f'BatchResult({self.path!r}, error={self.error!r})'
+        return f'BatchResult({self.path!r}, lexical_errors={len(self.lexical_errors)}, syntax_errors={len(self.syntax_errors)})'
+
+
+def detach(value):
+    """
+    Replaces, in place, the type of every token reachable from `value`
+    (AST nodes, lists and tuples) by its name. Returns `value`.
+    """
+    pending = [ value ]
+    while pending:
+        item = pending.pop()
+        if isinstance(item, Token):
+            if not isinstance(item.token_type, str):
+                item.token_type = item.token_type.Name
+        elif isinstance(item, Node):
+            pending.extend(item.__dict__.values())
+        elif isinstance(item, (list, tuple)):
+            pending.extend(item)
+    return value
+
+
+###### WORKERS ######
+
+def parse_file(path):
+    """
+    Tokenizes and parses the file at `path` with the module parser. A file
+    that can not be read gives a result with its error, so one bad path does
+    not fail the whole batch.
+    """
+    try:
+        with open(path, 'r', errors='replace') as source:
+            code = source.read()
+    except OSError as error:
+        return BatchResult(path, None, [], [], str(error))
+
+    lexical_errors = []
+    tokens = CoolLexer(errors=lexical_errors)(code)
+
+    ast, unexpected = CoolParser.evaluate(tokens)
+    syntax_errors = [] if unexpected is None else CoolParser.recover(tokens, CoolSynchronizing)
+
+    return BatchResult(path, detach(ast), lexical_errors, detach(syntax_errors))
+
+def parse_files(paths, workers=None, chunksize=None):
+    """
+    Parses the files at `paths` on a pool of `workers` processes, one per
+    core by default. Returns their `BatchResult`s in the order of `paths`.
+
+    Workers are forked when the platform allows it, so they inherit the
+    tables of `CoolParser` already built. Otherwise every worker imports
+    `cool.parser`, which loads the tables from the generated module or the
+    cache instead of building them.
+    """
+    paths = list(paths)
+    workers = workers or os.cpu_count() or 1
+    if workers == 1 or len(paths) < 2:
+        return [ parse_file(path) for path in paths ]
+
+    # A few chunks per worker, so a worker that got large files does not
+    # keep the rest waiting
+    if chunksize is None:
+        chunksize = max(1, len(paths) // (4 * workers))
+
+    context = multiprocessing.get_context('fork') if 'fork' in multiprocessing.get_all_start_methods() else None
+    with ProcessPoolExecutor(workers, mp_context=context) as pool:
+        return list(pool.map(parse_file, paths, chunksize=chunksize))
+
+
+##### PROCESS INPUT ######
+
+if __name__ == '__main__':
+
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(prog='python -m cool.batch', description='Parses many COOL files in parallel.')
+    parser.add_argument('paths', nargs='+', metavar='PATH', help='COOL files, or directories searched for .cl files')
+    parser.add_argument('--workers', type=int, help='worker processes, one per core by default')
+    parser.add_argument('--quiet', action='store_true', help='only print the summary')
+    args = parser.parse_args()
+
+    paths = []
+    for path in args.paths:
+        if os.path.isdir(path):
+            for root, _, files in os.walk(path):
+                paths.extend(os.path.join(root, name) for name in sorted(files) if name.endswith('.cl'))
+        else:
+            paths.append(path)
+
+    start = time.perf_counter()
+    results = parse_files(paths, args.workers)
+    elapsed = time.perf_counter() - start
+
+    for result in results:
+        if args.quiet or result.ok:
+            continue
+        if result.error is not None:
+            print(f'{result.path}: {result.error}')
+        for error in result.lexical_errors:
+            print(f'{result.path}:{error.line}:{error.column}: illegal text {error.text!r}')
+        for token in result.syntax_errors:
+            print(f'{result.path}:{token.line}:{token.column}: unexpected token {token.lex!r}')
+
+    failed = sum(not result.ok for result in results)
+    print(f'{len(results)} files, {failed} with errors, in {elapsed:.2f}s ({len(results) / elapsed:,.1f} files/s)')
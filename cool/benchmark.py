@@ -0,0 +1,235 @@
+import copy
+import json
+import os
+import platform
+import random
+import subprocess
+import tempfile
+import time
+import tracemalloc
+
+from .lexer import CoolLexer
+from .dfa_lexer import DFALexer
+from .parser import CoolParser
+
+
+###### CORPUS ######
+
+def identifier_heavy(rng, size):
+    lines = []
+    while sum(map(len, lines)) < size:
+        c = len(lines)
+        names = [ f'{rng.choice("abcdefghxyz")}{rng.randrange(10000)}_value' for _ in range(8) ]
+        lines.append(f'class Class{c} inherits IO {{')
+        lines.append(f'    {names[0]}({names[1]} : Int, {names[2]} : String) : AUTO_TYPE {{')
+        lines.append(f'        let {names[3]} : Int <- {names[1]} + {names[4]} * {names[5]} in {names[6]}.{names[7]}({names[3]}, {names[1]})')
+        lines.append('    };')
+        lines.append('};')
+    return '\n'.join(lines) + '\n'
+
+def string_heavy(rng, size):
+    lines = []
+    words = [ 'lorem', 'ipsum', 'dolor', 'sit', 'amet', '1234', '(*', '--', '{}' ]
+    while sum(map(len, lines)) < size:
+        text = ' '.join(rng.choice(words) for _ in range(rng.randrange(5, 30)))
+        lines.append(f'class S{len(lines)} {{ s : String <- "{text}"; t : String <- "{text[::-1]}"; }};')
+    return '\n'.join(lines) + '\n'
+
+def comment_heavy(rng, size):
+    lines = []
+    words = [ 'this', 'method', 'does', 'something', 'useful', 'x', '<-', 'y', '"quoted"' ]
+    while sum(map(len, lines)) < size:
+        text = ' '.join(rng.choice(words) for _ in range(rng.randrange(5, 20)))
+        lines.append(f'-- {text}')
+        lines.append(f'(* {text}\n   {text} *)')
+        lines.append(f'class K{len(lines)} {{ k : Int <- 0; }};')
+    return '\n'.join(lines) + '\n'
+
+def long_lines(rng, size):
+    # A whole program in a single line
+    parts = []
+    total = 0
+    while total < size:
+        part = f'class L{len(parts)} {{ f(a : Int) : Int {{ if a <= {rng.randrange(100)} then a + 1 else f(a - 1) fi }}; }}; '
+        parts.append(part)
+        total += len(part)
+    return ''.join(parts)
+
+CORPORA = {
+    'identifiers': identifier_heavy,
+    'strings': string_heavy,
+    'comments': comment_heavy,
+    'long-lines': long_lines,
+}
+
+def generate(name, size, seed=0):
+    return CORPORA[name](random.Random(seed), size)
+
+
+###### BACKENDS ######
+
+# Every backend turns a source, given both as text and as the path of a file
+# holding it, into a sequence of tokens. New ones only need to be registered here
+BACKENDS = {
+    'ply': lambda code, path: CoolLexer()(code),
+    'ply-stream': lambda code, path: CoolLexer().stream(code),
+    'dfa': lambda code, path: DFALexer()(code),
+    'dfa-stream': lambda code, path: DFALexer().stream(code),
+    'dfa-file': lambda code, path: DFALexer().stream_file(path),
+}
+
+
+###### PARSERS ######
+
+def packed_parser():
+    # The module parser is compiled without displacement, the packed tables
+    # are compiled on a copy so the shared parser is left untouched
+    parser = copy.copy(CoolParser)
+    parser.compile(compress=True)
+    return parser
+
+# Every driver parses a list of tokens, `steps` is the number of shifts and
+# reductions it goes through
+PARSERS = {
+    'slow': lambda parser, packed: parser.parse_traced,
+    'fast': lambda parser, packed: parser.parse_tables,
+    'compiled': lambda parser, packed: parser.parse_compiled,
+    'compiled-packed': lambda parser, packed: packed.parse_compiled,
+    'evaluate': lambda parser, packed: parser.evaluate_compiled,
+}
+
+
+###### MEASURES ######
+
+def measure(backend, code, path, repeat):
+    tokenize = BACKENDS[backend]
+
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        tokens = tokenize(code, path)
+        best = min(best, time.perf_counter() - start)
+    count = len(tokens)
+    del tokens
+
+    # Memory is traced apart, tracing slows the lexer down
+    tracemalloc.start()
+    tokens = tokenize(code, path)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del tokens
+
+    megabytes = len(code.encode()) / 2**20
+    return {
+        'tokens': count,
+        'seconds': best,
+        'tokens_per_second': count / best,
+        'mb_per_second': megabytes / best,
+        'peak_memory_mb': peak / 2**20,
+    }
+
+def measure_parser(parse, tokens, steps, repeat):
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        parse(tokens)
+        best = min(best, time.perf_counter() - start)
+
+    return {
+        'tokens': len(tokens),
+        'steps': steps,
+        'seconds': best,
+        'steps_per_second': steps / best,
+        'tokens_per_second': len(tokens) / best,
+    }
+
+def revision():
+    try:
+        return subprocess.check_output(['git', 'rev-parse', 'HEAD'], cwd=os.path.dirname(__file__),
+                                       stderr=subprocess.DEVNULL, text=True).strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def run(backends, corpora, size, repeat, seed=0, report=None):
+    results = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'size': size,
+        'repeat': repeat,
+        'results': [],
+    }
+    for corpus in corpora:
+        code = generate(corpus, size, seed)
+        with tempfile.NamedTemporaryFile('w', suffix='.cl', delete=False) as source:
+            source.write(code)
+        try:
+            for backend in backends:
+                result = measure(backend, code, source.name, repeat)
+                result.update(corpus=corpus, backend=backend, bytes=len(code.encode()))
+                results['results'].append(result)
+                if report is not None:
+                    report(result)
+        finally:
+            os.unlink(source.name)
+    return results
+
+def run_parsers(parsers, corpora, size, repeat, seed=0, report=None):
+    packed = packed_parser()
+    results = {
+        'revision': revision(),
+        'python': platform.python_version(),
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'size': size,
+        'repeat': repeat,
+        'results': [],
+    }
+    for corpus in corpora:
+        tokens = CoolLexer()(generate(corpus, size, seed))
+        output, operations = CoolParser.parse_compiled(tokens)
+        if operations is None:
+            raise ValueError(f'corpus {corpus} does not parse: {output}')
+        for name in parsers:
+            result = measure_parser(PARSERS[name](CoolParser, packed), tokens, len(operations), repeat)
+            result.update(corpus=corpus, parser=name)
+            results['results'].append(result)
+            if report is not None:
+                report(result)
+    return results
+
+
+##### PROCESS INPUT ######
+
+if __name__ == '__main__':
+
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='python -m cool.benchmark', description='Lexer and parser throughput benchmark.')
+    parser.add_argument('--backends', nargs='+', choices=list(BACKENDS), default=list(BACKENDS))
+    parser.add_argument('--parsers', nargs='*', choices=list(PARSERS),
+                        help='benchmark these parser drivers (all of them if none is given) instead of the lexers')
+    parser.add_argument('--corpora', nargs='+', choices=list(CORPORA), default=list(CORPORA))
+    parser.add_argument('--size', type=int, default=1 << 20, help='approximate size of every corpus in bytes')
+    parser.add_argument('--repeat', type=int, default=3, help='timed runs, the best one is kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='JSON file to save the results to')
+    args = parser.parse_args()
+
+    if args.parsers is not None:
+        def report(r):
+            print(f'{r["corpus"]:<12} {r["parser"]:<16} {r["steps"]:>9} {r["steps_per_second"]:>11,.0f} '
+                  f'{r["tokens_per_second"]:>11,.0f}')
+
+        print(f'{"corpus":<12} {"parser":<16} {"steps":>9} {"steps/s":>11} {"tokens/s":>11}')
+        results = run_parsers(args.parsers or list(PARSERS), args.corpora, args.size, args.repeat, args.seed, report)
+    else:
+        def report(r):
+            print(f'{r["corpus"]:<12} {r["backend"]:<11} {r["tokens"]:>9} {r["tokens_per_second"]:>11,.0f} '
+                  f'{r["mb_per_second"]:>7.2f} {r["peak_memory_mb"]:>8.2f}')
+
+        print(f'{"corpus":<12} {"backend":<11} {"tokens":>9} {"tokens/s":>11} {"MB/s":>7} {"peak MB":>8}')
+        results = run(args.backends, args.corpora, args.size, args.repeat, args.seed, report)
+
+    if args.output:
+        with open(args.output, 'w') as output:
+            json.dump(results, output, indent=2)
@@ -195,6 +195,37 @@ class State:
     def write_to(self, fname):
         return self.graph().write_svg(fname)
 
+def minimize_tables(start, symbols, label=lambda state: state.final):
+    """
+    Merges the equivalent states of the DFA `start` (Moore's partition refinement)
+    and returns its transition table as rows of integers, one column per symbol
+    in `symbols`, along with the label of each row. Row 0 is the start state and
+    -1 stands for the dead state. States are only merged if `label` agrees on them.
+    """
+    states = list(start)
+    labels = [ label(state) for state in states ]
+    targets = [ [ state.transitions[symbol][0] if symbol in state.transitions else None for symbol in symbols ] for state in states ]
+    index = { id(state): i for i, state in enumerate(states) }
+    targets = [ [ -1 if t is None else index[id(t)] for t in row ] for row in targets ]
+
+    blocks, count = None, 0
+    signatures = labels
+    while True:
+        numbering = {}
+        new_blocks = [ numbering.setdefault(signature, len(numbering)) for signature in signatures ]
+        if len(numbering) == count:
+            break
+        blocks, count = new_blocks, len(numbering)
+        signatures = [ (blocks[i], tuple(-1 if t < 0 else blocks[t] for t in row)) for i, row in enumerate(targets) ]
+
+    table = [ None ] * count
+    block_labels = [ None ] * count
+    for i, row in enumerate(targets):
+        if table[blocks[i]] is None:
+            table[blocks[i]] = [ -1 if t < 0 else blocks[t] for t in row ]
+            block_labels[blocks[i]] = labels[i]
+    return table, block_labels
+
 def multiline_formatter(state):
     return '\n'.join(str(item) for item in state)
 
@@ -1,5 +1,13 @@
+import hashlib
+import json
+import multiprocessing
+import os
+import tempfile
+import time
+from concurrent.futures import ProcessPoolExecutor
+from array import array
 from queue import Queue
-from .pycompiler import Grammar, Item
+from .pycompiler import Grammar, Item, Terminal
 from .automata import State
 from .utils import ContainerSet
 
@@ -122,6 +130,216 @@ class GrammarTools:
         
         return follows
 
+    ###### BITSETS ######
+
+    # First/Follow sets as ints, the bit of a terminal is `1 << terminal.Id`,
+    # the same as in the lookaheads of `Item.key`, and epsilon (Id 0) is bit 0
+    EPSILON = 1
+
+    @staticmethod
+    def terminal_bits(G: Grammar):
+        return { terminal: 1 << terminal.Id for terminal in [ G.EOF ] + G.terminals }
+
+    @staticmethod
+    def terminals_by_id(G: Grammar):
+        """
+        Terminals of `G` indexed by their Id, epsilon is left out
+        """
+        terminals = [ None ] * G.terminalCount
+        for terminal in [ G.EOF ] + G.terminals:
+            terminals[terminal.Id] = terminal
+        return terminals
+
+    @staticmethod
+    def terminals_of(mask, terminals):
+        """
+        Terminals whose bits are set in `mask`, `terminals` is the list of them by Id
+        """
+        result = []
+        while mask:
+            bit = mask & -mask
+            result.append(terminals[bit.bit_length() - 1])
+            mask ^= bit
+        return result
+
+    @staticmethod
+    def sentence_bits(alpha, bits, masks):
+        """
+        First(alpha) as a bitset, given the bitsets of First(Vn)
+        """
+        first = 0
+        for symbol in alpha:
+            mask = masks[symbol] if symbol.IsNonTerminal else bits[symbol]
+            first |= mask & ~GrammarTools.EPSILON
+            if not mask & GrammarTools.EPSILON:
+                return first
+        return first | GrammarTools.EPSILON
+
+    @staticmethod
+    def strongly_connected(nodes, edges):
+        """
+        Tarjan's algorithm, yields the strongly connected components of the
+        graph so that the components reachable from one come before it
+        """
+        index, low = {}, {}
+        stack, on_stack = [], set()
+
+        for root in nodes:
+            if root in index:
+                continue
+            index[root] = low[root] = len(index)
+            stack.append(root)
+            on_stack.add(root)
+            work = [ (root, iter(edges[root])) ]
+
+            while work:
+                node, children = work[-1]
+                for child in children:
+                    if child not in index:
+                        index[child] = low[child] = len(index)
+                        stack.append(child)
+                        on_stack.add(child)
+                        work.append((child, iter(edges[child])))
+                        break
+                    if child in on_stack:
+                        low[node] = min(low[node], index[child])
+                else:
+                    work.pop()
+                    if work:
+                        parent = work[-1][0]
+                        low[parent] = min(low[parent], low[node])
+                    if low[node] == index[node]:
+                        component = []
+                        while True:
+                            member = stack.pop()
+                            on_stack.remove(member)
+                            component.append(member)
+                            if member == node:
+                                break
+                        yield component
+
+    @staticmethod
+    def _solve(nodes, edges, step):
+        """
+        Calls `step(x)` (True if it changed x) on every node in dependency
+        order, repeating only inside the components that have cycles
+        """
+        for component in GrammarTools.strongly_connected(nodes, edges):
+            cyclic = len(component) > 1 or component[0] in edges[component[0]]
+            changed = True
+            while changed:
+                changed = False
+                for x in component:
+                    changed |= step(x)
+                changed &= cyclic
+
+    @staticmethod
+    def compute_first_bits(G: Grammar, bits=None):
+        """
+        Computes First(Vn) as bitsets
+        """
+        bits = bits or GrammarTools.terminal_bits(G)
+        masks = { nonterminal: 0 for nonterminal in G.nonTerminals }
+        # X depends on every nonterminal of its right sides
+        edges = { X: { symbol for production in X.productions for symbol in production.Right if symbol.IsNonTerminal }
+                  for X in G.nonTerminals }
+
+        def step(X):
+            first = masks[X]
+            for production in X.productions:
+                first |= GrammarTools.sentence_bits(production.Right, bits, masks)
+            changed, masks[X] = first != masks[X], first
+            return changed
+
+        GrammarTools._solve(G.nonTerminals, edges, step)
+        return masks
+
+    @staticmethod
+    def compute_follow_bits(G: Grammar, first_masks, bits=None):
+        """
+        Computes Follow(Vn) as bitsets
+        """
+        bits = bits or GrammarTools.terminal_bits(G)
+        follows = { nonterminal: 0 for nonterminal in G.nonTerminals }
+        follows[G.startSymbol] = bits[G.EOF]
+        # Y depends on X if X -> zeta Y beta and beta ->* epsilon
+        edges = { nonterminal: set() for nonterminal in G.nonTerminals }
+
+        for production in G.Productions:
+            alpha = list(production.Right)
+            for i, symbol in enumerate(alpha):
+                if symbol.IsNonTerminal:
+                    first_beta = GrammarTools.sentence_bits(alpha[i + 1:], bits, first_masks)
+                    follows[symbol] |= first_beta & ~GrammarTools.EPSILON
+                    if first_beta & GrammarTools.EPSILON:
+                        edges[symbol].add(production.Left)
+
+        def step(Y):
+            follow = follows[Y]
+            for X in edges[Y]:
+                follow |= follows[X]
+            changed, follows[Y] = follow != follows[Y], follow
+            return changed
+
+        GrammarTools._solve(G.nonTerminals, edges, step)
+        return follows
+
+    @staticmethod
+    def to_container(mask, terminals):
+        """
+        ContainerSet of a bitset, `terminals` is the list of them by Id
+        """
+        container = ContainerSet(contains_epsilon=bool(mask & GrammarTools.EPSILON))
+        container.set.update(GrammarTools.terminals_of(mask & ~GrammarTools.EPSILON, terminals))
+        return container
+
+    @staticmethod
+    def compute_firsts_fast(G: Grammar):
+        """
+        Same result as `compute_firsts`, computed over bitsets
+        """
+        bits = GrammarTools.terminal_bits(G)
+        masks = GrammarTools.compute_first_bits(G, bits)
+        terminals = GrammarTools.terminals_by_id(G)
+
+        firsts = { terminal: ContainerSet(terminal) for terminal in G.terminals }
+        for nonterminal, mask in masks.items():
+            firsts[nonterminal] = GrammarTools.to_container(mask, terminals)
+        for production in G.Productions:
+            if production.Right not in firsts:
+                firsts[production.Right] = GrammarTools.to_container(
+                    GrammarTools.sentence_bits(production.Right, bits, masks), terminals)
+        return firsts
+
+    @staticmethod
+    def compute_follows_fast(G: Grammar):
+        """
+        Same result as `compute_follows`, computed over bitsets
+        """
+        bits = GrammarTools.terminal_bits(G)
+        follows = GrammarTools.compute_follow_bits(G, GrammarTools.compute_first_bits(G, bits), bits)
+        terminals = GrammarTools.terminals_by_id(G)
+        return { nonterminal: GrammarTools.to_container(mask, terminals) for nonterminal, mask in follows.items() }
+
+    @staticmethod
+    def is_identity_unit(production):
+        """
+        Whether `production` is A -> B, B a nonterminal, with the semantic
+        action `lambda h, s: s[1]`
+        """
+        right = production.Right
+        if len(right) != 1 or not right[0].IsNonTerminal:
+            return False
+        try:
+            rule = production.attributes[0].__code__
+        except (AttributeError, IndexError):
+            return False
+        identity = GrammarTools._identity.__code__
+        return (rule.co_code, rule.co_consts, rule.co_names, rule.co_argcount) == \
+               (identity.co_code, identity.co_consts, identity.co_names, identity.co_argcount)
+
+    _identity = staticmethod(lambda h, s: s[1])
+
     @staticmethod
     def _register(table, state, symbol, value):
         if state not in table:
@@ -153,26 +371,589 @@ class Action(tuple):
 
     __repr__ = __str__
 
+class CompiledTables:
+    """
+    Integer form of the action/goto tables of a `ShiftReduceParser`.
+
+    Columns and productions are numbered by the ids the grammar gives them
+    (nonterminal columns follow the terminal ones) and the action and goto
+    rows of every state are merged into a single row of `table`, a flat
+    array. States are known by the offset of their row, so a cell is read
+    with a single indexed load at `row + column`. An action is an int:
+    `(row << 2) | SHIFT`, `(production << 2) | REDUCE`, `OK` or `ERROR`, a
+    goto cell holds the row of the target state.
+
+    Rows are either laid out one after the other (dense) or packed into each
+    other by row displacement. Packed cells belong to a row only if `check`
+    holds that row at the same index, any other cell is an error.
+    """
+    ERROR, SHIFT, REDUCE, OK = 0, 1, 2, 3
+
+    def __init__(self, parser, compress=True):
+        G = parser.G
+        self.terminals = { t: t.Id for t in [ G.EOF ] + G.terminals }
+        # Column of the token types that are not in the grammar, the one of
+        # epsilon, it is never filled
+        self.unknown = G.Epsilon.Id
+        nonterminals = { x: G.terminalCount + x.Id for x in G.nonTerminals }
+        self.width = G.terminalCount + G.nonTerminalCount
+
+        self.productions = list(G.Productions)
+        self.lengths = array('i', (len(p.Right) for p in self.productions))
+        self.goto_columns = array('i', (nonterminals[p.Left] for p in self.productions))
+
+        states = set(parser.action) | set(parser.goto)
+        pack = self.displace if compress else self.dense
+        self.rows = pack({ state: [ *(self.terminals[t] for t in parser.action.get(state, ())),
+                                    *(nonterminals[x] for x in parser.goto.get(state, ())) ]
+                           for state in states })
+        self.states = { row: state for state, row in self.rows.items() }
+        self.start = self.rows[0]
+
+        def encode(action):
+            kind, tag = action
+            if kind == Action.SHIFT:
+                return (self.rows[tag] << 2) | self.SHIFT
+            if kind == Action.REDUCE:
+                return (tag.Id << 2) | self.REDUCE
+            return self.OK
+
+        # Padded so `row + column` is always inside the arrays
+        size = max(self.rows.values(), default=0) + self.width
+        self.table = array('l', [ self.ERROR ]) * size
+        self.check = array('l', [ -1 ]) * size if compress else None
+        for state, row in self.rows.items():
+            cells = [ (self.terminals[t], encode(cell[0])) for t, cell in parser.action.get(state, {}).items() ]
+            cells += [ (nonterminals[x], self.rows[cell[0]]) for x, cell in parser.goto.get(state, {}).items() ]
+            for column, value in cells:
+                self.table[row + column] = value
+                if compress:
+                    self.check[row + column] = row
+
+    def dense(self, columns):
+        return { state: state * self.width for state in columns }
+
+    def displace(self, columns):
+        """
+        Row displacement, every row is placed at the first free offset where
+        its cells only fall on free ones. The fullest rows are placed first.
+        """
+        rows, taken = {}, set()
+        # Free cells are kept past the last used one, so `find` never fails
+        used = bytearray(self.width)
+        # Cells only get used, so a row with the same columns as an already
+        # placed one can not fit before it
+        resume = {}
+
+        for state in sorted(columns, key=lambda state: (-len(columns[state]), state)):
+            cells = tuple(sorted(columns[state])) or (0,)
+            first = cells[0]
+            offset = resume.get(cells, 0)
+            while True:
+                # Jump to the next offset where the first cell is free
+                offset = used.find(0, offset + first) - first
+                if offset not in taken and not any(used[offset + x] for x in cells):
+                    break
+                offset += 1
+            if len(used) < offset + 2 * self.width:
+                used.extend(bytes(offset + 2 * self.width - len(used)))
+            for x in columns[state]:
+                used[offset + x] = 1
+            rows[state] = offset
+            resume[cells] = offset + 1
+            taken.add(offset)
+
+        return rows
+
+    @property
+    def nbytes(self):
+        arrays = (self.table, self.check or array('l'), self.lengths, self.goto_columns)
+        return sum(len(a) * a.itemsize for a in arrays)
+
+def write_atomic(path, write):
+    """
+    Calls `write(file)` on a temporary file next to `path` and then moves it
+    to `path`, so a reader never sees half a file. Every writer gets its own
+    temporary file, so writers running at the same time do not mix.
+    """
+    directory = os.path.dirname(os.path.abspath(path))
+    os.makedirs(directory, exist_ok=True)
+    fd, temporary = tempfile.mkstemp(suffix='.tmp', dir=directory)
+    try:
+        with os.fdopen(fd, 'w') as f:
+            write(f)
+            # mkstemp makes the file private, it gets the mode `open` would give
+            umask = os.umask(0)
+            os.umask(umask)
+            os.fchmod(fd, 0o666 & ~umask)
+        os.replace(temporary, path)
+    except BaseException:
+        try:
+            os.unlink(temporary)
+        except OSError:
+            pass
+        raise
+
 class ShiftReduceParser:  
-    def __init__(self, G, verbose=False):
+    # Attributes computed along with the tables that are also cached
+    table_attributes = ()
+
+    def __init__(self, G, verbose=False, cache=None):
         self.G = G
         self.verbose = verbose
         self.action = {}
         self.goto = {}
-        self._build_parsing_table()
+        self.tables = None
+        self.automaton = None
+        # Seconds spent on every phase of the construction
+        self.timings = {}
+        start = time.perf_counter()
+        if cache is not None and self.load_tables(cache):
+            self.timings['load'] = time.perf_counter() - start
+        else:
+            self._build_parsing_table()
+            if cache is not None:
+                self.save_tables(cache)
     
     def _build_parsing_table(self):
         raise NotImplementedError()
 
+    def shortcut_unit_productions(self):
+        """
+        Removes from the tables the reductions by unit productions A -> B
+        whose semantic action is the identity. If the state reached on B from
+        a state p only reduces by A -> B, the goto of p on B goes straight to
+        the goto of p on A, and the value of B is kept as the value of A.
+
+        The tables must be complete, and parses recorded by `__call__` lack
+        the skipped reductions. Returns the number of gotos redirected.
+        """
+        # States whose only action, on every lookahead, is reducing by an
+        # identity unit production
+        units = {}
+        for state, row in self.action.items():
+            if self.goto.get(state):
+                continue
+            productions = { action for cell in row.values() for action in cell }
+            if len(productions) != 1 or any(len(cell) > 1 for cell in row.values()):
+                continue
+            kind, production = next(iter(productions))
+            if kind == Action.REDUCE and GrammarTools.is_identity_unit(production):
+                units[state] = production
+
+        redirected = {}
+        for state, row in self.goto.items():
+            for symbol, cell in row.items():
+                target, seen = cell[0], set()
+                while target in units and target not in seen:
+                    seen.add(target)
+                    target = row[units[target].Left][0]
+                if target != cell[0]:
+                    redirected[state, symbol] = target
+
+        for (state, symbol), target in redirected.items():
+            self.goto[state][symbol] = [ target ]
+        return len(redirected)
+
+    def conflicts(self):
+        """
+        Returns the (state, symbol, actions) of every cell with more than one action
+        """
+        return [ (state, symbol, cell) for state, row in self.action.items()
+                 for symbol, cell in row.items() if len(cell) > 1 ]
+
+    def report(self):
+        """
+        Size, density and conflicts of the tables, with the time spent on
+        every phase of the construction. States, items and the items behind
+        every conflict are only known if the automaton was built, not when
+        the tables were loaded.
+        """
+        G = self.G
+        states = max(set(self.action) | set(self.goto), default=-1) + 1
+        action_cells = sum(map(len, self.action.values()))
+        goto_cells = sum(map(len, self.goto.values()))
+        nodes = { node.idx: node for node in self.automaton } if self.automaton is not None else {}
+
+        conflicts = []
+        for state, symbol, cell in self.conflicts():
+            kinds = { action for action, _ in cell }
+            conflict = {
+                'state': state,
+                'symbol': symbol.Name,
+                'kind': 'shift/reduce' if Action.SHIFT in kinds else 'reduce/reduce',
+                'actions': [ str(action) for action in cell ],
+            }
+            if state in nodes:
+                conflict['items'] = sorted(str(item) for item in nodes[state].state
+                                           if item.NextSymbol == symbol or (item.IsReduceItem and symbol in item.lookaheads))
+            conflicts.append(conflict)
+
+        return {
+            'parser': type(self).__name__,
+            'terminals': len(G.terminals) + 1,
+            'nonterminals': len(G.nonTerminals),
+            'productions': len(G.Productions),
+            'states': states,
+            'items': sum(len(node.state) for node in nodes.values()) if nodes else None,
+            'action_cells': action_cells,
+            'action_density': action_cells / (states * (len(G.terminals) + 1)) if states else 0,
+            'goto_cells': goto_cells,
+            'goto_density': goto_cells / (states * len(G.nonTerminals)) if states else 0,
+            'conflicts': conflicts,
+            'timings': dict(self.timings),
+        }
+
+    def grammar_hash(self, kind=None):
+        """
+        Hash of the grammar productions, together with the kind of parser
+        """
+        G = self.G
+        lines = [ kind or type(self).__name__, G.startSymbol.Name ]
+        lines.extend(p.Left.Name + ' -> ' + ' '.join(s.Name for s in p.Right) for p in G.Productions)
+        return hashlib.sha256('\n'.join(lines).encode()).hexdigest()
+
+    def table_data(self):
+        """
+        The tables as plain data, productions are given by their index in the
+        grammar and symbols by their name
+        """
+        def encode(action):
+            kind, tag = action
+            return [ kind, tag.Id if kind == Action.REDUCE else tag ]
+
+        # Sorted, so the same tables always give the same data
+        return {
+            'hash': self.grammar_hash(),
+            'attributes': { name: getattr(self, name) for name in self.table_attributes },
+            'action': [ [ state, symbol.Name, [ encode(a) for a in row[symbol] ] ]
+                        for state, row in sorted(self.action.items()) for symbol in sorted(row, key=lambda x: x.Name) ],
+            'goto': [ [ state, symbol.Name, row[symbol] ]
+                      for state, row in sorted(self.goto.items()) for symbol in sorted(row, key=lambda x: x.Name) ],
+        }
+
+    def set_tables(self, data):
+        G = self.G
+        productions = G.Productions
+
+        def decode(action):
+            kind, tag = action
+            return Action((kind, productions[tag] if kind == Action.REDUCE else tag))
+
+        for state, symbol, cell in data['action']:
+            self.action.setdefault(state, {})[G[symbol]] = [ decode(a) for a in cell ]
+        for state, symbol, cell in data['goto']:
+            self.goto.setdefault(state, {})[G[symbol]] = cell
+        for name, value in data['attributes'].items():
+            setattr(self, name, value)
+
+    def save_tables(self, path):
+        """
+        Writes the action/goto tables to `path` as JSON
+        """
+        data = self.table_data()
+        try:
+            write_atomic(path, lambda f: json.dump(data, f))
+        except OSError:
+            pass
+
+    def load_tables(self, path):
+        """
+        Loads the tables saved by `save_tables`, returns False when there are
+        none or they were built for another grammar
+        """
+        try:
+            with open(path) as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return False
+
+        if data.get('hash') != self.grammar_hash():
+            return False
+
+        self.set_tables(data)
+        return True
+
+    def write_module(self, path):
+        """
+        Writes a Python module holding the tables as literals, it is loaded
+        back by `PrecompiledParser`. Reductions refer to the productions (and
+        so to their semantic actions) by index in the grammar.
+        """
+        data = self.table_data()
+        lines = [
+            f'# Parsing tables of {type(self).__name__}, generated by cool.cmp.grammartools, do not edit',
+            '',
+            f'PARSER = {type(self).__name__!r}',
+            f'GRAMMAR_HASH = {data["hash"]!r}',
+            f'ATTRIBUTES = {data["attributes"]!r}',
+            '',
+            '# (left side, arity) of every production',
+            f'PRODUCTIONS = {[ (p.Left.Name, len(p.Right)) for p in self.G.Productions ]!r}',
+            '',
+            '# (state, terminal, actions)',
+            'ACTION = [',
+            *(f'    {tuple(entry)!r},' for entry in data['action']),
+            ']',
+            '',
+            '# (state, nonterminal, state)',
+            'GOTO = [',
+            *(f'    {tuple(entry)!r},' for entry in data['goto']),
+            ']',
+        ]
+
+        write_atomic(path, lambda f: f.write('\n'.join(lines) + '\n'))
+
+    def compile(self, compress=True):
+        """
+        Builds the `CompiledTables` of the parser, they are used from now on
+        to parse unless the parser is verbose
+        """
+        self.tables = CompiledTables(self, compress)
+        return self.tables
+
+    def parse_compiled(self, w):
+        tables = self.tables
+        terminals, unknown = tables.terminals, tables.unknown
+        table, check = tables.table, tables.check
+        productions, lengths, goto_columns = tables.productions, tables.lengths, tables.goto_columns
+        SHIFT, REDUCE, OK = CompiledTables.SHIFT, CompiledTables.REDUCE, CompiledTables.OK
+        shift_operation, reduce_operation = Action.SHIFT, Action.REDUCE
+
+        # The stack holds the rows of the states, not their numbers
+        next_token = iter(w).__next__
+        stack = [ tables.start ]
+        output, operations = [], []
+        push, record, operate = stack.append, output.append, operations.append
+        token = next_token()
+        lookahead = terminals.get(token.token_type, unknown)
+
+        while True:
+            row = stack[-1]
+            entry = table[row + lookahead]
+            if check is not None and check[row + lookahead] != row:
+                entry = CompiledTables.ERROR
+            kind = entry & 3
+
+            if kind == REDUCE:
+                production = entry >> 2
+                del stack[len(stack) - lengths[production]:]
+                push(table[stack[-1] + goto_columns[production]])
+                record(productions[production])
+                operate(reduce_operation)
+            elif kind == SHIFT:
+                push(entry >> 2)
+                token = next_token()
+                lookahead = terminals.get(token.token_type, unknown)
+                operate(shift_operation)
+            elif kind == OK:
+                return output, operations
+            else:
+                print('Parsing Error:', [ tables.states[row] for row in stack ], token)
+                return token, None
+
+    def parse_tables(self, w):
+        """
+        Driver over the action/goto dicts with the tables bound to locals,
+        the arity and left side of every production precomputed, and missing
+        actions found through a sentinel instead of exceptions
+        """
+        action, goto = self.action, self.goto
+        SHIFT, REDUCE = Action.SHIFT, Action.REDUCE
+        reductions = { production: (len(production.Right), production.Left) for production in self.G.Productions }
+        error = [ (None, None) ]
+
+        next_token = iter(w).__next__
+        stack = [ 0 ]
+        output, operations = [], []
+        push, record, operate = stack.append, output.append, operations.append
+        token = next_token()
+
+        while True:
+            kind, tag = action[stack[-1]].get(token.token_type, error)[0]
+
+            if kind == REDUCE:
+                size, left = reductions[tag]
+                if size:
+                    del stack[-size:]
+                push(goto[stack[-1]][left][0])
+                record(tag)
+                operate(REDUCE)
+            elif kind == SHIFT:
+                push(tag)
+                token = next_token()
+                operate(SHIFT)
+            elif kind is None:
+                print('Parsing Error:', stack, token)
+                return token, None
+            else:
+                return output, operations
+
+    def evaluate(self, w):
+        """
+        Parses `w` evaluating the semantic action of every production when it
+        is reduced, the values are kept on a stack along with the states, so
+        no parse is recorded. Only synthesized attributes are supported.
+        Returns (value, None), or (None, token) with the unexpected token.
+        """
+        if self.tables is not None and not self.verbose:
+            return self.evaluate_compiled(w)
+
+        tokens = iter(w)
+        stack, values = [ 0 ], []
+        token = next(tokens)
+
+        while True:
+            state = stack[-1]
+            if self.verbose: print(stack, token)
+
+            try:
+                action, tag = self.action[state][token.token_type][0]
+            except KeyError:
+                if self.verbose: print('Parsing Error:', stack, token)
+                return None, token
+
+            if action == Action.SHIFT:
+                stack.append(tag)
+                values.append(token)
+                token = next(tokens)
+            elif action == Action.REDUCE:
+                rule, size = tag.attributes[0], len(tag.Right)
+                if size:
+                    value = rule(None, [ None ] + values[-size:])
+                    del stack[-size:], values[-size:]
+                else:
+                    value = rule(None, None)
+                values.append(value)
+                stack.append(self.goto[stack[-1]][tag.Left][0])
+            elif action == Action.OK:
+                return values[-1], None
+            else:
+                assert False, 'Must be something wrong!'
+
+    def evaluate_compiled(self, w):
+        tables = self.tables
+        terminals, unknown = tables.terminals, tables.unknown
+        table, check = tables.table, tables.check
+        lengths, goto_columns = tables.lengths, tables.goto_columns
+        rules = [ production.attributes[0] for production in tables.productions ]
+
+        tokens = iter(w)
+        stack, values = [ tables.start ], []
+        token = next(tokens)
+        lookahead = terminals.get(token.token_type, unknown)
+
+        while True:
+            row = stack[-1]
+            entry = table[row + lookahead]
+            if check is not None and check[row + lookahead] != row:
+                entry = CompiledTables.ERROR
+            kind = entry & 3
+
+            if kind == CompiledTables.SHIFT:
+                stack.append(entry >> 2)
+                values.append(token)
+                token = next(tokens)
+                lookahead = terminals.get(token.token_type, unknown)
+            elif kind == CompiledTables.REDUCE:
+                production = entry >> 2
+                size = lengths[production]
+                if size:
+                    value = rules[production](None, [ None ] + values[-size:])
+                    del stack[-size:], values[-size:]
+                else:
+                    value = rules[production](None, None)
+                values.append(value)
+                stack.append(table[stack[-1] + goto_columns[production]])
+            elif kind == CompiledTables.OK:
+                return values[-1], None
+            else:
+                return None, token
+
+    def recover(self, w, synchronizing, shifts=3):
+        """
+        Parses `w` in panic mode and returns every unexpected token.
+
+        On an error, tokens are skipped up to the next one in `synchronizing`
+        (or EOF) and states are popped until one has an action on it, then
+        parsing goes on from there. An error is reported only if `shifts`
+        tokens were shifted since the previous one, so the cascade of errors
+        of a single mistake is reported once.
+        """
+        synchronizing = set(synchronizing)
+        EOF = self.G.EOF
+        tokens = iter(w)
+        stack = [ 0 ]
+        errors = []
+        token, position = next(tokens), 0
+        shifted, recovered_at = shifts, -1
+
+        while True:
+            state = stack[-1]
+            try:
+                action, tag = self.action[state][token.token_type][0]
+            except KeyError:
+                if shifted >= shifts:
+                    errors.append(token)
+                shifted = 0
+
+                # Failing again on the token parsing was resumed at: skip it
+                if position == recovered_at:
+                    if token.token_type == EOF:
+                        return errors
+                    token, position = next(tokens), position + 1
+
+                while True:
+                    while token.token_type not in synchronizing and token.token_type != EOF:
+                        token, position = next(tokens), position + 1
+                    depth = len(stack)
+                    while depth and token.token_type not in self.action[stack[depth - 1]]:
+                        depth -= 1
+                    if depth:
+                        del stack[depth:]
+                        break
+                    if token.token_type == EOF:
+                        return errors
+                    token, position = next(tokens), position + 1
+
+                recovered_at = position
+                continue
+
+            if action == Action.SHIFT:
+                stack.append(tag)
+                token, position = next(tokens), position + 1
+                shifted += 1
+            elif action == Action.REDUCE:
+                if tag.Right:
+                    del stack[-len(tag.Right):]
+                stack.append(self.goto[stack[-1]][tag.Left][0])
+            elif action == Action.OK:
+                return errors
+            else:
+                assert False, 'Must be something wrong!'
+
     def __call__(self, w):
+        # `w` may be any iterable of tokens, they are pulled one at a time
+        # so a lazy token stream is never materialized by the parser
+        if self.verbose:
+            return self.parse_traced(w)
+        if self.tables is not None:
+            return self.parse_compiled(w)
+        return self.parse_tables(w)
+
+    def parse_traced(self, w):
+        """
+        Reference driver, it prints every step when the parser is verbose
+        """
+        tokens = iter(w)
         stack = [ 0 ]
-        cursor = 0
         output, operations = [], []
+        token = next(tokens)
         
         while True:
             state = stack[-1]
-            lookahead = w[cursor].token_type
-            if self.verbose: print(stack, w[cursor:])
+            lookahead = token.token_type
+            if self.verbose: print(stack, token)
                 
             # (Detect error)
             try:
@@ -180,7 +961,7 @@ class ShiftReduceParser:
                 # (Shift case)
                 if action == Action.SHIFT:
                     stack.append(tag)
-                    cursor += 1
+                    token = next(tokens)
                     operations.append(action)
                 # (Reduce case)
                 elif action == Action.REDUCE:
@@ -196,10 +977,31 @@ class ShiftReduceParser:
                 else:
                     assert False, 'Must be something wrong!'
             except KeyError:
-                print('Parsing Error:', stack, w[cursor:])
-                return w[cursor:][0], None
+                print('Parsing Error:', stack, token)
+                return token, None
+
+###### PARALLEL CONSTRUCTION ######
+
+# Parser and First sets of a worker process, inherited from the parent (fork)
+# since productions hold lambdas and can not be pickled
+_worker = None
+
+def _init_worker(parser, firsts):
+    global _worker
+    _worker = (parser, firsts, {})
+
+def _expand_kernels(kernels):
+    parser, firsts, suffix_firsts = _worker
+    return [ parser.expand_kernel(kernel, firsts, suffix_firsts) for kernel in kernels ]
 
 class LR1Parser(ShiftReduceParser):
+    table_attributes = ('is_lr1',)
+
+    def __init__(self, G, verbose=False, cache=None, workers=None):
+        # More than one worker builds the automaton in parallel
+        self.workers = workers
+        super().__init__(G, verbose, cache)
+
     @staticmethod
     def expand(item, firsts):
         next_symbol = item.NextSymbol
@@ -230,20 +1032,59 @@ class LR1Parser(ShiftReduceParser):
         return { Item(x.production, x.pos, set(lookahead)) for x, lookahead in centers.items() }
 
     @staticmethod
-    def closure_lr1(items, firsts):
-        closure = ContainerSet(*items)
-        
-        changed = True
-        while changed:
-            changed = False
-            
-            new_items = ContainerSet()
-            for item in closure:
-                new_items.extend(LR1Parser.expand(item, firsts))
+    def closure_lr1(items, firsts, suffix_firsts=None):
+        """
+        Worklist closure, an item is expanded again only with the lookaheads
+        it gained since it was last expanded. `suffix_firsts` keeps, for every
+        (production id, position), First(beta) and the productions to expand,
+        and may be shared among calls.
+        """
+        if suffix_firsts is None:
+            suffix_firsts = {}
 
-            changed = closure.update(new_items)
-            
-        return LR1Parser.compress(closure)
+        productions = {}
+        lookaheads = {}
+        pending = []
+
+        def add(production, pos, new):
+            center = (production.Id, pos)
+            try:
+                current = lookaheads[center]
+            except KeyError:
+                current = lookaheads[center] = set()
+                productions[center] = production
+            new = new - current
+            if new:
+                current.update(new)
+                pending.append((center, new))
+
+        for item in items:
+            add(item.production, item.pos, set(item.lookaheads))
+
+        while pending:
+            center, new = pending.pop()
+            try:
+                expansion = suffix_firsts[center]
+            except KeyError:
+                # X -> alpha . Y beta, children are the productions of Y
+                production, pos = productions[center], center[1]
+                right = production.Right
+                if pos == len(right) or not right[pos].IsNonTerminal:
+                    expansion = None
+                else:
+                    expansion = (GrammarTools.compute_local_first(firsts, right[pos + 1:]), right[pos].productions)
+                suffix_firsts[center] = expansion
+            if expansion is None:
+                continue
+
+            # children get First(beta) and the lookaheads of the item too
+            # if beta ->* epsilon
+            first_beta, children = expansion
+            lookahead = first_beta.set | new if first_beta.contains_epsilon else first_beta.set
+            for child in children:
+                add(child, 0, lookahead)
+
+        return { Item(productions[center], center[1], lookahead) for center, lookahead in lookaheads.items() }
     
     @staticmethod
     def goto_lr1(items, symbol, firsts=None, just_kernel=False):
@@ -255,53 +1096,150 @@ class LR1Parser(ShiftReduceParser):
     def build_LR1_automaton(self):
         G = self.augmentedG = self.G.AugmentedGrammar(True)
 
-        firsts = GrammarTools.compute_firsts(G)
+        begin = time.perf_counter()
+        firsts = GrammarTools.compute_firsts_fast(G)
         firsts[G.EOF] = ContainerSet(G.EOF)
+        self.timings['first'] = time.perf_counter() - begin
         
+        begin = time.perf_counter()
+        closure_time = 0
         start_production = G.startSymbol.productions[0]
         start_item = Item(start_production, 0, lookaheads=(G.EOF,))
         start = frozenset([start_item])
         
-        closure = LR1Parser.closure_lr1(start, firsts)
+        suffix_firsts = {}
+        closure = LR1Parser.closure_lr1(start, firsts, suffix_firsts)
         automaton = State(frozenset(closure), True)
         
         pending = [ start ]
         visited = { start: automaton }
+        symbols = G.terminals + G.nonTerminals
         
         while pending:
             current = pending.pop()
             current_state = visited[current]
+
+            # (Kernels of every transition in a single pass over the items)
+            gotos = {}
+            for item in current_state.state:
+                next_symbol = item.NextSymbol
+                if next_symbol is not None:
+                    gotos.setdefault(next_symbol, []).append(item.NextItem())
             
-            for symbol in G.terminals + G.nonTerminals:
+            for symbol in symbols:
                 # (Get/Build `next_state`)
-                kernels = LR1Parser.goto_lr1(current_state.state, symbol, just_kernel=True)
-                
-                if not kernels:
+                try:
+                    kernels = frozenset(gotos[symbol])
+                except KeyError:
                     continue
                 
                 try:
                     next_state = visited[kernels]
                 except KeyError:
                     pending.append(kernels)
-                    visited[pending[-1]] = next_state = State(frozenset(LR1Parser.goto_lr1(current_state.state, symbol, firsts)), True)
+                    closure_start = time.perf_counter()
+                    visited[kernels] = next_state = State(frozenset(LR1Parser.closure_lr1(kernels, firsts, suffix_firsts)), True)
+                    closure_time += time.perf_counter() - closure_start
                 
                 current_state.add_transition(symbol.Name, next_state)
         
         # automaton.set_formatter(empty_formatter)
         self.automaton = automaton
+        self.timings['closure'] = closure_time
+        self.timings['goto'] = time.perf_counter() - begin - closure_time
+
+    def build_automaton(self):
+        if self.workers and self.workers > 1 and 'fork' in multiprocessing.get_all_start_methods():
+            self.build_LR1_automaton_parallel(self.workers)
+        else:
+            self.build_LR1_automaton()
+
+    def decode_item(self, key):
+        """
+        Item of its `Item.key`, the picklable form items are sent in
+        """
+        production, pos, lookaheads = key
+        return Item(self.productions[production], pos, GrammarTools.terminals_of(lookaheads, self.terminals))
+
+    def expand_kernel(self, kernel, firsts, suffix_firsts):
+        """
+        Closure of an encoded kernel and the kernels of its successors, by
+        symbol name in the order the serial construction adds transitions
+        """
+        closure = LR1Parser.closure_lr1([ self.decode_item(code) for code in kernel ], firsts, suffix_firsts)
+
+        gotos = {}
+        for item in closure:
+            next_symbol = item.NextSymbol
+            if next_symbol is not None:
+                gotos.setdefault(next_symbol, []).append(item.NextItem().key)
+
+        successors = [ (symbol.Name, frozenset(gotos[symbol])) for symbol in self.symbols if symbol in gotos ]
+        return [ item.key for item in closure ], successors
+
+    def build_LR1_automaton_parallel(self, workers):
+        """
+        Same automaton as `build_LR1_automaton`, the frontier of new kernels is
+        expanded level by level in batches on a pool of processes. Results are
+        merged in submission order, so the automaton (and the state ids taken
+        from it) does not depend on the scheduling.
+        """
+        G = self.augmentedG = self.G.AugmentedGrammar(True)
+
+        begin = time.perf_counter()
+        firsts = GrammarTools.compute_firsts_fast(G)
+        firsts[G.EOF] = ContainerSet(G.EOF)
+        self.timings['first'] = time.perf_counter() - begin
+
+        # Closures and gotos are computed together by the workers
+        begin = time.perf_counter()
+        self.productions = G.Productions
+        self.terminals = GrammarTools.terminals_by_id(G)
+        self.symbols = G.terminals + G.nonTerminals
+
+        start = frozenset([ Item(G.startSymbol.productions[0], 0, lookaheads=(G.EOF,)).key ])
+        expanded = {}
+        frontier, seen = [ start ], { start }
+
+        context = multiprocessing.get_context('fork')
+        with ProcessPoolExecutor(workers, mp_context=context, initializer=_init_worker, initargs=(self, firsts)) as pool:
+            while frontier:
+                size = -(-len(frontier) // (4 * workers))
+                batches = [ frontier[i:i + size] for i in range(0, len(frontier), size) ]
+                frontier = []
+                for batch, results in zip(batches, pool.map(_expand_kernels, batches)):
+                    for kernel, (closure, successors) in zip(batch, results):
+                        expanded[kernel] = closure, successors
+                        for _, successor in successors:
+                            if successor not in seen:
+                                seen.add(successor)
+                                frontier.append(successor)
+
+        states = { kernel: State(frozenset(self.decode_item(code) for code in closure), True)
+                   for kernel, (closure, _) in expanded.items() }
+        for kernel, (_, successors) in expanded.items():
+            for name, successor in successors:
+                states[kernel].add_transition(name, states[successor])
+
+        self.automaton = states[start]
+        self.timings['automaton'] = time.perf_counter() - begin
 
     def _build_parsing_table(self):
         self.is_lr1 = True
-        self.build_LR1_automaton()
+        self.build_automaton()
         
         for i, node in enumerate(self.automaton):
             if self.verbose: print(i, '\t', '\n\t '.join(str(x) for x in node.state), '\n')
             node.idx = i
             node.tag = f'I{i}'
 
+        begin = time.perf_counter()
+
+        # Items are visited in grammar order, so the actions of a conflict are
+        # listed in the same order however the item sets were built
         for node in self.automaton:
             idx = node.idx
-            for item in node.state:
+            for item in sorted(node.state, key=lambda item: item.key):
                 # - Fill `self.Action` and `self.Goto` according to `item`)
                 # - Feel free to use `self._register(...)`)
                 if item.IsReduceItem:
@@ -321,4 +1259,221 @@ class LR1Parser(ShiftReduceParser):
                     else:
                         self.is_lr1 &= GrammarTools._register(self.goto, idx, next_symbol, 
                                                             node[next_symbol.Name][0].idx)
-                pass
\ No newline at end of file
+                pass
+
+        self.timings['table'] = time.perf_counter() - begin
+
+class LALR1Parser(LR1Parser):
+    """
+    LALR(1) parser, it shares the states of the LR(0) automaton and computes
+    their lookaheads by propagation instead of building the canonical LR(1)
+    collection. `is_lr1` is False if merging the lookaheads added conflicts.
+    """
+
+    @staticmethod
+    def closure_lr0(items):
+        closure = set(items)
+        pending = list(items)
+
+        while pending:
+            next_symbol = pending.pop().NextSymbol
+            if next_symbol is None or not next_symbol.IsNonTerminal:
+                continue
+            for prod in next_symbol.productions:
+                item = Item(prod, 0)
+                if item not in closure:
+                    closure.add(item)
+                    pending.append(item)
+
+        return closure
+
+    def build_LR0_kernels(self, G):
+        """
+        Returns the kernels of the LR(0) automaton and the transitions between
+        them, as a list of { symbol name: kernel index } 
+        """
+        start = frozenset([ Item(G.startSymbol.productions[0], 0) ])
+        kernels, transitions = [ start ], []
+        visited = { start: 0 }
+        symbols = G.terminals + G.nonTerminals
+
+        for kernel in kernels:
+            closure = LALR1Parser.closure_lr0(kernel)
+            row = {}
+            for symbol in symbols:
+                next_kernel = frozenset(item.NextItem() for item in closure if item.NextSymbol == symbol)
+                if not next_kernel:
+                    continue
+                try:
+                    row[symbol.Name] = visited[next_kernel]
+                except KeyError:
+                    row[symbol.Name] = visited[next_kernel] = len(kernels)
+                    kernels.append(next_kernel)
+            transitions.append(row)
+
+        return kernels, transitions
+
+    def build_automaton(self):
+        G = self.augmentedG = self.G.AugmentedGrammar(True)
+
+        begin = time.perf_counter()
+        firsts = GrammarTools.compute_firsts_fast(G)
+        firsts[G.EOF] = ContainerSet(G.EOF)
+        self.timings['first'] = time.perf_counter() - begin
+
+        # Lookahead that stands for "whatever follows the kernel item"
+        dummy = Terminal('#', G)
+        dummy.Id = G.terminalCount
+        firsts[dummy] = ContainerSet(dummy)
+
+        suffix_firsts = {}
+        begin = time.perf_counter()
+        kernels, transitions = self.build_LR0_kernels(G)
+        self.timings['goto'] = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        lookaheads = [ { item: set() for item in kernel } for kernel in kernels ]
+        lookaheads[0][Item(G.startSymbol.productions[0], 0)].add(G.EOF)
+
+        # (Spontaneous lookaheads and propagation links)
+        propagation = {}
+        for i, kernel in enumerate(kernels):
+            for item in kernel:
+                links = propagation[i, item] = []
+                for child in LR1Parser.closure_lr1([ Item(item.production, item.pos, (dummy,)) ], firsts, suffix_firsts):
+                    next_symbol = child.NextSymbol
+                    if next_symbol is None:
+                        continue
+                    j = transitions[i][next_symbol.Name]
+                    target = Item(child.production, child.pos + 1)
+                    for lookahead in child.lookaheads:
+                        if lookahead is dummy:
+                            links.append((j, target))
+                        else:
+                            lookaheads[j][target].add(lookahead)
+
+        # (Propagate until nothing changes)
+        changed = True
+        while changed:
+            changed = False
+            for (i, item), links in propagation.items():
+                source = lookaheads[i][item]
+                for j, target in links:
+                    current = lookaheads[j][target]
+                    size = len(current)
+                    current.update(source)
+                    changed |= len(current) != size
+
+        self.timings['lookaheads'] = time.perf_counter() - begin
+
+        begin = time.perf_counter()
+        states = [ State(frozenset(LR1Parser.closure_lr1([ Item(item.production, item.pos, lookaheads[i][item]) for item in kernel ], firsts, suffix_firsts)), True)
+                   for i, kernel in enumerate(kernels) ]
+        for state, row in zip(states, transitions):
+            for name, j in row.items():
+                state.add_transition(name, states[j])
+
+        self.automaton = states[0]
+        self.timings['closure'] = time.perf_counter() - begin
+
+class PrecompiledParser(ShiftReduceParser):
+    """
+    Parser over the tables of a module written by `ShiftReduceParser.write_module`,
+    no grammar analysis is done. Raises ValueError if the module was written
+    for another grammar.
+    """
+
+    def __init__(self, G, module, verbose=False):
+        self.module = module
+        super().__init__(G, verbose)
+
+    def _build_parsing_table(self):
+        module = self.module
+        if module.GRAMMAR_HASH != self.grammar_hash(module.PARSER):
+            raise ValueError(f'{module.__name__} holds the tables of another grammar')
+        # Reductions refer to the productions by index
+        if module.PRODUCTIONS != [ (p.Left.Name, len(p.Right)) for p in self.G.Productions ]:
+            raise ValueError(f'{module.__name__} lists other productions than the grammar')
+
+        self.table_attributes = tuple(module.ATTRIBUTES)
+        self.set_tables({ 'action': module.ACTION, 'goto': module.GOTO, 'attributes': module.ATTRIBUTES })
+
+class LazyTable(dict):
+    """
+    Table whose rows are filled by `fill(state)` the first time they are read
+    """
+    def __init__(self, fill):
+        super().__init__()
+        self.fill = fill
+
+    def __missing__(self, state):
+        self.fill(state)
+        return self[state]
+
+class LazyLR1Parser(LR1Parser):
+    """
+    LR(1) parser that builds its states as the driver reaches them. It starts
+    with the closure of the start item only, and the action and goto rows of
+    a state (with the kernels of its successors) are computed the first time
+    the state is on top of the stack, then kept.
+
+    The tables only hold the visited states, so they can not be cached nor
+    compiled, and `is_lr1` only tells about the states built so far.
+    """
+
+    def __init__(self, G, verbose=False):
+        super().__init__(G, verbose)
+
+    def _build_parsing_table(self):
+        G = self.augmentedG = self.G.AugmentedGrammar(True)
+
+        self.firsts = GrammarTools.compute_firsts_fast(G)
+        self.firsts[G.EOF] = ContainerSet(G.EOF)
+        self.suffix_firsts = {}
+        self.is_lr1 = True
+
+        start = frozenset([ Item(G.startSymbol.productions[0], 0, lookaheads=(G.EOF,)) ])
+        self.kernels = [ start ]
+        self.states = { start: 0 }
+        self.action = LazyTable(self._build_state)
+        self.goto = LazyTable(self._build_state)
+
+    def state_of(self, kernel):
+        try:
+            return self.states[kernel]
+        except KeyError:
+            self.states[kernel] = len(self.kernels)
+            self.kernels.append(kernel)
+            return self.states[kernel]
+
+    def _build_state(self, idx):
+        if not 0 <= idx < len(self.kernels):
+            raise KeyError(idx)
+        G = self.augmentedG
+        closure = LR1Parser.closure_lr1(self.kernels[idx], self.firsts, self.suffix_firsts)
+
+        gotos = {}
+        for item in closure:
+            next_symbol = item.NextSymbol
+            if next_symbol is not None:
+                gotos.setdefault(next_symbol, []).append(item.NextItem())
+        successors = { symbol: self.state_of(frozenset(kernel)) for symbol, kernel in gotos.items() }
+
+        # Rows are set even if empty, so they are not built again
+        self.action.setdefault(idx, {})
+        self.goto.setdefault(idx, {})
+
+        for item in closure:
+            if item.IsReduceItem:
+                prod = item.production
+                if prod.Left == G.startSymbol:
+                    self.is_lr1 &= GrammarTools._register(self.action, idx, G.EOF, Action((Action.OK, '')))
+                else:
+                    for lookahead in item.lookaheads:
+                        self.is_lr1 &= GrammarTools._register(self.action, idx, lookahead, Action((Action.REDUCE, prod)))
+            else:
+                next_symbol = item.NextSymbol
+                if next_symbol.IsTerminal:
+                    self.is_lr1 &= GrammarTools._register(self.action, idx, next_symbol, Action((Action.SHIFT, successors[next_symbol])))
+                else:
+                    self.is_lr1 &= GrammarTools._register(self.goto, idx, next_symbol, successors[next_symbol])
@@ -5,6 +5,10 @@ class Symbol(object):
     def __init__(self, name, grammar):
         self.Name = name
         self.Grammar = grammar
+        # dense number given by the grammar, terminals and nonterminals are
+        # numbered apart. Among terminals 0 is epsilon and EOF is 1, so the bit
+        # `1 << Id` of a terminal is the same in every bitset of terminals
+        self.Id = None
 
     def __str__(self):
         return self.Name
@@ -224,6 +228,9 @@ class Production(object):
 
         self.Left = nonTerminal
         self.Right = sentence
+        # index in the grammar productions, given by the grammar
+        self.Id = None
+        self.hash = hash((nonTerminal, sentence))
 
     def __str__(self):
         return '%s → %s' % (self.Left, self.Right)
@@ -236,10 +243,10 @@ class Production(object):
         yield self.Right
 
     def __eq__(self, other):
-        return isinstance(other, Production) and self.Left == other.Left and self.Right == other.Right
+        return self is other or isinstance(other, Production) and self.Left == other.Left and self.Right == other.Right
 
     def __hash__(self):
-        return hash((self.Left, self.Right))
+        return self.hash
 
     @property
     def IsEpsilon(self):
@@ -284,9 +291,14 @@ class Grammar():
         # production type
         self.pType = None
         self.Epsilon = Epsilon(self)
+        self.Epsilon.Id = 0
         self.EOF = EOF(self)
+        self.EOF.Id = 1
 
         self.symbDict = { '$': self.EOF }
+        # next ids to give
+        self.terminalCount = 2
+        self.nonTerminalCount = 0
 
     def NonTerminal(self, name, startSymbol = False):
 
@@ -295,6 +307,8 @@ class Grammar():
             raise Exception("Empty name")
 
         term = NonTerminal(name,self)
+        term.Id = self.nonTerminalCount
+        self.nonTerminalCount += 1
 
         if startSymbol:
 
@@ -324,6 +338,7 @@ class Grammar():
 
         # for avoid repeated productions
         if production not in production.Left.productions:
+            production.Id = len(self.Productions)
             production.Left.productions.append(production)
             self.Productions.append(production)
 
@@ -335,6 +350,8 @@ class Grammar():
             raise Exception("Empty name")
 
         term = Terminal(name, self)
+        term.Id = self.terminalCount
+        self.terminalCount += 1
         self.terminals.append(term)
         self.symbDict[name] = term
         return term
@@ -427,6 +444,8 @@ class Grammar():
         G.Epsilon = self.Epsilon
         G.EOF = self.EOF
         G.symbDict = self.symbDict.copy()
+        G.terminalCount = self.terminalCount
+        G.nonTerminalCount = self.nonTerminalCount
 
         return G
 
@@ -460,12 +479,20 @@ class Grammar():
     #endchange
 
 class Item:
+    __slots__ = ('production', 'pos', 'lookaheads', 'key', 'hash')
 
     def __init__(self, production, pos, lookaheads=[]):
         self.production = production
         self.pos = pos
         self.lookaheads = frozenset(look for look in lookaheads)
 
+        # (production id, dot, lookaheads as a bitmask of terminal ids)
+        mask = 0
+        for lookahead in self.lookaheads:
+            mask |= 1 << lookahead.Id
+        self.key = (production.Id, pos, mask)
+        self.hash = hash(self.key)
+
     def __str__(self):
         s = str(self.production.Left) + " -> "
         if len(self.production.Right) > 0:
@@ -485,14 +512,10 @@ class Item:
 
 
     def __eq__(self, other):
-        return (
-            (self.pos == other.pos) and
-            (self.production == other.production) and
-            (set(self.lookaheads) == set(other.lookaheads))
-        )
+        return self.key == other.key
 
     def __hash__(self):
-        return hash((self.production,self.pos,self.lookaheads))
+        return self.hash
 
     @property
     def IsReduceItem(self):
@@ -1,3 +1,7 @@
+import sys
+from array import array
+from bisect import bisect_right
+
 class ContainerSet:
     def __init__(self, *values, contains_epsilon=False):
         self.set = set(values)
@@ -86,3 +90,165 @@ class Token:
     @property
     def is_valid(self):
         return True
+
+class SymbolTable:
+    """
+    Names seen in one compilation.
+
+    Every distinct name is stored once and gets a small integer id, so equal
+    names are the same `str` object. Names are also interned with `sys.intern`
+    to be shared with the string constants of the semantic passes.
+    """
+
+    def __init__(self):
+        self.ids = {}
+        self.names = []
+
+    def intern(self, name):
+        try:
+            return self.names[self.ids[name]]
+        except KeyError:
+            name = sys.intern(name)
+            self.ids[name] = len(self.names)
+            self.names.append(name)
+            return name
+
+    def id(self, name):
+        return self.ids[name]
+
+    def __getitem__(self, id):
+        return self.names[id]
+
+    def __contains__(self, name):
+        return name in self.ids
+
+    def __len__(self):
+        return len(self.names)
+
+class TokenStream:
+    """
+    Compact sequence of tokens.
+
+    Kinds, offsets, lines and columns are stored in `array` buffers and
+    `Token` objects are only built when a position is accessed.
+
+    Parameters
+    ----------
+    source : str
+        Text the offsets point into.
+    token_types : list
+        Token type of every kind id.
+    decoders : list
+        Function computing the lexeme of every kind id from its text,
+        None to keep the text as it is.
+    """
+
+    # Pending shifts are applied to the buffers once there are more than these
+    max_shifts = 16
+
+    def __init__(self, source, token_types, decoders):
+        self.source = source
+        self.token_types = token_types
+        self.decoders = decoders
+        self.kinds = array('B')
+        self.starts = array('l')
+        self.ends = array('l')
+        self.lines = array('i')
+        self.columns = array('i')
+        # (index, offset delta, line delta) pending from `index` on, sorted by index
+        self.shifts = []
+        self.shift_indexes = []
+
+    def append(self, kind, start, end, line, column):
+        offset_delta, line_delta = self.shift(len(self.kinds))
+        self.kinds.append(kind)
+        self.starts.append(start - offset_delta)
+        self.ends.append(end - offset_delta)
+        self.lines.append(line - line_delta)
+        self.columns.append(column)
+
+    def shift(self, index):
+        i = bisect_right(self.shift_indexes, index) - 1
+        return (0, 0) if i < 0 else self.shifts[i][1:]
+
+    def start(self, index):
+        return self.starts[index] + self.shift(index)[0]
+
+    def end(self, index):
+        return self.ends[index] + self.shift(index)[0]
+
+    def line(self, index):
+        return self.lines[index] + self.shift(index)[1]
+
+    def bisect(self, offset):
+        """
+        Index of the first token ending at or after `offset`.
+        """
+        lo, hi = 0, len(self.kinds)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self.end(mid) < offset:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def splice(self, first, last, tokens, offset_delta, line_delta, source):
+        """
+        Replaces the tokens in [first, last) with `tokens`, tuples of
+        (kind, start, end, line, column) in `source`, and moves the tokens after
+        them `offset_delta` characters and `line_delta` lines. The moved tokens
+        are not touched, their shift is recorded and applied when they are read.
+        """
+        base_offset, base_line = self.shift(first)
+        tail_offset, tail_line = self.shift(last)
+        moved = first + len(tokens)
+
+        self.kinds[first:last] = array('B', (t[0] for t in tokens))
+        self.starts[first:last] = array('l', (t[1] - base_offset for t in tokens))
+        self.ends[first:last] = array('l', (t[2] - base_offset for t in tokens))
+        self.lines[first:last] = array('i', (t[3] - base_line for t in tokens))
+        self.columns[first:last] = array('i', (t[4] for t in tokens))
+
+        before = [ s for s in self.shifts[:bisect_right(self.shift_indexes, first)] if s[0] < moved ]
+        after = [ (index + moved - last, offset + offset_delta, line + line_delta)
+                  for index, offset, line in self.shifts[bisect_right(self.shift_indexes, last):] ]
+        self.shifts = before + [ (moved, tail_offset + offset_delta, tail_line + line_delta) ] + after
+        self.shift_indexes = [ s[0] for s in self.shifts ]
+        self.source = source
+
+        if len(self.shifts) > self.max_shifts:
+            self.apply_shifts()
+
+    def apply_shifts(self):
+        bounds = self.shift_indexes[1:] + [ len(self.kinds) ]
+        for (index, offset_delta, line_delta), bound in zip(self.shifts, bounds):
+            for i in range(index, bound):
+                self.starts[i] += offset_delta
+                self.ends[i] += offset_delta
+                self.lines[i] += line_delta
+        self.shifts, self.shift_indexes = [], []
+
+    def lexeme(self, index):
+        offset_delta = self.shift(index)[0]
+        text = self.source[self.starts[index] + offset_delta:self.ends[index] + offset_delta]
+        decode = self.decoders[self.kinds[index]]
+        return text if decode is None else decode(text)
+
+    def __len__(self):
+        return len(self.kinds)
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [ self[i] for i in range(*index.indices(len(self))) ]
+        if index < 0:
+            index += len(self)
+        return Token(self.lexeme(index), self.token_types[self.kinds[index]], self.line(index), self.columns[index])
+
+    def __iter__(self):
+        for index in range(len(self.kinds)):
+            yield self[index]
+
+    @property
+    def nbytes(self):
+        return sum(buffer.itemsize * len(buffer) for buffer in (self.kinds, self.starts, self.ends, self.lines, self.columns))
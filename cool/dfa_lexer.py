@@ -0,0 +1,323 @@
+from .cmp import State, Token, minimize_tables
+from .parser import CoolGrammar
+from .lexer import tokens_dict, ignored, line_offsets, resolve_identifier
+from .lexer import kind_ids, identifier_kinds, fixed_lexemes, make_stream, bytes_decoders, LexerBase
+import mmap
+
+
+###### CHARACTER SETS ######
+
+# Characters outside ASCII are replaced by '?' before scanning, they can only
+# appear inside strings and comments, exactly like '?' itself
+ALPHABET = frozenset(range(128))
+
+def charset(chars):
+    return frozenset(ord(c) for c in chars)
+
+DIGITS = charset('0123456789')
+UPPER = charset('ABCDEFGHIJKLMNOPQRSTUVWXYZ')
+LOWER = charset('abcdefghijklmnopqrstuvwxyz')
+ID_CHARS = DIGITS | UPPER | LOWER | charset('_')
+BLANKS = charset(ignored)
+
+
+###### NFA FRAGMENTS ######
+
+class NFABuilder:
+    """
+    Thompson construction of the token rules over `cool.cmp.State`.
+    Every fragment is a pair (start, end) with a single exit state.
+    """
+
+    def __init__(self):
+        self.count = 0
+
+    def state(self):
+        self.count += 1
+        return State(self.count)
+
+    def chars(self, chars):
+        start, end = self.state(), self.state()
+        for c in chars:
+            start.add_transition(c, end)
+        return start, end
+
+    def text(self, string):
+        return self.concat(*(self.chars(charset(c)) for c in string))
+
+    def concat(self, *fragments):
+        for (_, end), (start, _) in zip(fragments, fragments[1:]):
+            end.add_epsilon_transition(start)
+        return fragments[0][0], fragments[-1][1]
+
+    def union(self, *fragments):
+        start, end = self.state(), self.state()
+        for first, last in fragments:
+            start.add_epsilon_transition(first)
+            last.add_epsilon_transition(end)
+        return start, end
+
+    def star(self, fragment):
+        start, end = self.state(), self.state()
+        first, last = fragment
+        start.add_epsilon_transition(first)
+        start.add_epsilon_transition(end)
+        last.add_epsilon_transition(first)
+        last.add_epsilon_transition(end)
+        return start, end
+
+    def plus(self, fragment):
+        first, last = fragment
+        last.add_epsilon_transition(first)
+        return fragment
+
+    def block_comment(self):
+        # (* ... *), closed by the first '*)' found
+        body, stars, end = self.state(), self.state(), self.state()
+        _, opened = start = self.text('(*')
+        opened.add_epsilon_transition(body)
+        for c in ALPHABET - charset('*'):
+            body.add_transition(c, body)
+        body.add_transition(ord('*'), stars)
+        stars.add_transition(ord('*'), stars)
+        stars.add_transition(ord(')'), end)
+        for c in ALPHABET - charset('*)'):
+            stars.add_transition(c, body)
+        return start[0], end
+
+
+def build_rules(nfa):
+    """
+    Token rules in priority order, the same rules `cool.lexer` gives to ply.
+    Keywords are not rules, they are resolved after an identifier is matched.
+    """
+    string_char = nfa.union(nfa.chars(ALPHABET - charset('\0\n"')), nfa.text('\\\n'))
+    return [
+        ('WHITESPACE', nfa.plus(nfa.chars(BLANKS))),
+        ('COMMENT', nfa.union(nfa.concat(nfa.text('--'), nfa.star(nfa.chars(ALPHABET - charset('\n')))), nfa.block_comment())),
+        ('INTEGER', nfa.plus(nfa.chars(DIGITS))),
+        ('STRING', nfa.concat(nfa.text('"'), nfa.star(string_char), nfa.text('"'))),
+        ('TYPE', nfa.concat(nfa.chars(UPPER), nfa.star(nfa.chars(ID_CHARS)))),
+        ('ID', nfa.concat(nfa.chars(LOWER), nfa.star(nfa.chars(ID_CHARS)))),
+    ] + [ (kind, nfa.text(lexeme)) for kind, lexeme in fixed_lexemes.items() ]
+
+
+###### DFA TABLES ######
+
+def character_classes(start):
+    """
+    Groups together the characters that label exactly the same NFA edges and
+    relabels every transition with the id of its character class.
+    """
+    states = list(start)
+    signatures = { c: [] for c in ALPHABET }
+    for state in states:
+        for c, targets in state.transitions.items():
+            signatures[c].extend((id(state), id(t)) for t in targets)
+
+    numbering = {}
+    classes = [ numbering.setdefault(frozenset(signatures[c]), len(numbering)) for c in sorted(ALPHABET) ]
+
+    for state in states:
+        transitions = {}
+        for c, targets in state.transitions.items():
+            transitions.setdefault(classes[c], set()).update(targets)
+        state.transitions = { cls: list(targets) for cls, targets in transitions.items() }
+
+    return classes, len(numbering)
+
+def build_tables():
+    nfa = NFABuilder()
+    rules = build_rules(nfa)
+
+    start = nfa.state()
+    priority = {}
+    for i, (name, (first, last)) in enumerate(rules):
+        start.add_epsilon_transition(first)
+        last.final = True
+        priority[id(last)] = i
+
+    classes, width = character_classes(start)
+    dfa = start.to_deterministic()
+
+    def label(state):
+        matched = [ priority[id(s)] for s in state.state if s.final ]
+        return rules[min(matched)][0] if matched else None
+
+    table, labels = minimize_tables(dfa, range(width), label)
+
+    # Rows are indexed by byte, so the source is scanned as it is with no
+    # translated copy. Bytes outside ASCII behave like '?'. Rows are flattened
+    # into a single list, a transition holds the offset of its target row so
+    # the scanner never multiplies
+    classmap = [ classes[c] if c < 128 else classes[ord('?')] for c in range(256) ]
+    transitions = [ -1 if row[c] < 0 else row[c] * 256 for row in table for c in classmap ]
+    accepting = [ None ] * len(transitions)
+    for i, name in enumerate(labels):
+        accepting[i * 256] = name
+
+    return transitions, accepting
+
+transitions, accepting = build_tables()
+
+skipped = { 'WHITESPACE', 'COMMENT' }
+
+OPEN, STAR = ord('('), ord('*')
+
+converters = {
+    'INTEGER': lambda lexeme: ('INTEGER', int(lexeme)),
+    'STRING': lambda lexeme: ('STRING', lexeme[1:-1]),
+    'TYPE': resolve_identifier,
+    'ID': resolve_identifier,
+}
+
+
+###### TOKENIZER ######
+
+class DFALexer(LexerBase):
+    """
+    Table-driven COOL lexer, an alternative backend to `CoolLexer`.
+
+    It scans with the minimized DFA of the token rules (longest match, the
+    earliest rule wins ties) and produces the same tokens as the ply backend.
+    """
+
+    def __init__(self, symbols=None, errors=None, max_errors=100):
+        super().__init__(symbols, errors, max_errors)
+        self.bytes_decoders = bytes_decoders(self.decoders)
+
+    def scan(self, code, pos=0):
+        """
+        Yields (kind, start, end) for every token of `code` from `pos` on, blanks
+        and comments are skipped and keywords are not resolved yet. `code` may be
+        a `str` or a bytes-like object such as an `mmap`.
+        """
+        trans, accept = transitions, accepting
+        # Bytes-like sources, an `mmap` included, are indexed in place
+        data = code.encode('ascii', 'replace') if isinstance(code, str) else code
+
+        n = len(data)
+        # Once a '(*' runs to the end of the source without being closed, no
+        # later one can be closed either, they are lexed as '(' at once
+        unclosed = n
+        self.error_pos, self.error_line = 0, 1
+        while pos < n:
+            if data[pos] == OPEN and pos > unclosed and pos + 1 < n and data[pos + 1] == STAR:
+                yield '(', pos, pos + 1
+                pos += 1
+                continue
+
+            # Longest match from `pos`
+            state, i, end, kind = 0, pos, pos, None
+            while i < n:
+                state = trans[state + data[i]]
+                if state < 0:
+                    break
+                i += 1
+                if accept[state] is not None:
+                    end, kind = i, accept[state]
+
+            if i == n and kind == '(' and pos + 1 < n and data[pos + 1] == STAR:
+                unclosed = pos
+
+            if kind is None:
+                # The run goes on while no token can start
+                end = pos + 1
+                while end < n and trans[data[end]] < 0:
+                    end += 1
+                self.report(code, pos, code[pos:end])
+                pos = end
+                continue
+
+            if kind not in skipped:
+                yield kind, pos, end
+            pos = end
+
+    def tokenize(self, code):
+        intern = self.symbols.intern
+        offsets = line_offsets(code)
+        last, line = len(offsets) - 1, 0
+
+        for kind, start, end in self.scan(code):
+            lexeme = code[start:end]
+            try:
+                kind, lexeme = converters[kind](lexeme)
+            except KeyError:
+                pass
+            if kind in identifier_kinds:
+                lexeme = intern(lexeme)
+            while line < last and offsets[line + 1] <= start:
+                line += 1
+            yield Token(lexeme, tokens_dict[kind], line + 1, start - offsets[line])
+
+        yield Token('$', CoolGrammar.EOF, last + 1, len(code) - offsets[last])
+
+    def spans(self, code, pos=0):
+        """
+        Yields (kind id, start, end) for every token of `code` from `pos` on.
+        """
+        for kind, start, end in self.scan(code, pos):
+            if kind in identifier_kinds:
+                lexeme = code[start:end]
+                kind = resolve_identifier(lexeme if isinstance(lexeme, str) else lexeme.decode())[0]
+            yield kind_ids[kind], start, end
+
+    def stream(self, code):
+        return make_stream(code, self.spans(code), self.decoders)
+
+    def stream_file(self, path):
+        """
+        Tokenizes the file at `path` without reading it into memory. The file is
+        scanned through a read-only map, the stream points into it and lexemes
+        are decoded only when a token is read. Offsets and columns are counted
+        in bytes.
+        """
+        with open(path, 'rb') as source:
+            try:
+                code = mmap.mmap(source.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # Empty files cannot be mapped
+                code = b''
+        return make_stream(code, self.spans(code), self.bytes_decoders)
+
+    def __call__(self, code):
+        return list(self.tokenize(code))
+
+
+##### BENCHMARK ######
+
+if __name__ == '__main__':
+
+    import sys
+    import time
+    import tracemalloc
+    from .lexer import CoolLexer
+
+    if len(sys.argv) not in (2, 3):
+        print('usage: python -m cool.dfa_lexer <source.cl> [repeat]', file=sys.stderr)
+        sys.exit(1)
+
+    with open(sys.argv[1], 'r') as source:
+        code = source.read()
+    repeat = int(sys.argv[2]) if len(sys.argv) == 3 else 5
+
+    results = {}
+    for name, lexer in (('ply', CoolLexer()), ('dfa', DFALexer())):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            tokens = lexer(code)
+            best = min(best, time.perf_counter() - start)
+        results[name] = [ (t.lex, t.token_type, t.line, t.column) for t in tokens ]
+        print(f'{name}: {len(tokens)} tokens in {best:.4f}s ({len(tokens) / best:,.0f} tokens/s)')
+
+    print('same tokens' if results['ply'] == results['dfa'] else 'TOKENS DIFFER')
+
+    # Memory held by a list of `Token` against a `TokenStream`
+    for name, build in (('list of Token', DFALexer()), ('TokenStream', DFALexer().stream)):
+        tracemalloc.start()
+        tokens = build(code)
+        size, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        print(f'{name}: {size / 2**20:.2f} MiB held, {peak / 2**20:.2f} MiB peak')
+        del tokens
@@ -1,6 +1,7 @@
+import re
 import ply.lex as lex
 from .parser import CoolGrammar
-from .cmp import Token
+from .cmp import Token, TokenStream, SymbolTable
 
 
 ###### TOKEN LISTS ######
@@ -53,6 +54,43 @@ tokens_dict['LESSEQUAL'] = CoolGrammar['<=']
 tokens_dict['EQUAL'] = CoolGrammar['=']
 tokens_dict['INT_COMPLEMENT'] = CoolGrammar['~']
 
+# Kinds whose lexeme is always the same text
+fixed_lexemes = { literal: literal for literal in literals }
+fixed_lexemes.update(ASSIGN='<-', LESS='<', LESSEQUAL='<=', EQUAL='=', INT_COMPLEMENT='~', ACTION='=>')
+
+# Small integer ids of the token kinds, used by `TokenStream`
+token_kinds = list(tokens_dict) + ['$']
+kind_ids = { kind: i for i, kind in enumerate(token_kinds) }
+token_types = [ tokens_dict[kind] for kind in token_kinds[:-1] ] + [ CoolGrammar.EOF ]
+
+decoders = [ None ] * len(token_kinds)
+decoders[kind_ids['INTEGER']] = int
+decoders[kind_ids['STRING']] = lambda text: text[1:-1]
+decoders[kind_ids['BOOL']] = lambda text: text == 'true'
+decoders[kind_ids['$']] = lambda text: '$'
+
+identifier_kinds = { 'ID', 'TYPE' }
+
+def symbol_decoders(symbols):
+	# Identifiers and type names are interned in the compilation's symbol table
+	interned = list(decoders)
+	for kind in identifier_kinds:
+		interned[kind_ids[kind]] = symbols.intern
+	return interned
+
+def bytes_decoders(decoders):
+	# Lexemes of streams over raw bytes are decoded when they are read, and
+	# never for kinds whose text is known beforehand
+	def decoding(decode):
+		if decode is None:
+			return lambda data: data.decode()
+		return lambda data: decode(data.decode())
+
+	result = [ decoding(decode) for decode in decoders ]
+	for kind, lexeme in fixed_lexemes.items():
+		result[kind_ids[kind]] = lambda data, lexeme=lexeme: lexeme
+	return result
+
 ###### TOKEN RULES ######
 
 # Primitive data types
@@ -67,30 +105,46 @@ def t_STRING(t):
 	t.value = t.value[1:-1]
 	return t
 
-def t_BOOL(t):
-	r'true|false'
-	t.value = True if t.value == 'true' else False
-	return t
-
 def t_COMMENT(t):
-	r'--[^\n]+\n|\(\*[^(\*\))]+\*\)'
+	r'--[^\n]*|\(\*'
+	if t.value == '(*':
+		# The block comment ends at the first '*)'. An unterminated one is lexed
+		# as '(' and '*', and once a search failed no later '(*' can be closed,
+		# so the rest of the source is not searched again for each of them
+		lexer = t.lexer
+		unclosed = getattr(lexer, 'unclosed_comment', None)
+		if unclosed is not None and unclosed[0] is lexer.lexdata and unclosed[1] <= t.lexpos:
+			end = -1
+		else:
+			end = lexer.lexdata.find('*)', t.lexpos + 2)
+		if end == -1:
+			lexer.unclosed_comment = (lexer.lexdata, t.lexpos)
+			lexer.lexpos = t.lexpos + 1
+			t.type = t.value = '('
+			return t
+		lexer.lexpos = end + 2
 	pass  # Discard comments
 
-# Other tokens with precedence before TYPE and ID
+# Identifiers, keywords are resolved once the whole identifier is matched
 
-def t_NOT(t):
-	r'[nN][oO][tT]'
-	return t
-
-# Identifiers
+def resolve_identifier(lexeme):
+	lower = lexeme.lower()
+	if lower == 'not':
+		return 'NOT', lexeme
+	if lexeme[0].isupper():
+		return 'TYPE', lexeme
+	if lexeme in ('true', 'false'):
+		return 'BOOL', lexeme == 'true'
+	return reserved.get(lower, 'ID'), lexeme
 
 def t_TYPE(t):
 	r'[A-Z][A-Za-z0-9_]*'
+	t.type, t.value = resolve_identifier(t.value)
 	return t
 
 def t_ID(t):
 	r'[a-z][A-Za-z0-9_]*'
-	t.type = reserved.get(t.value.lower(), 'ID')
+	t.type, t.value = resolve_identifier(t.value)
 	return t
 
 # Operators
@@ -108,33 +162,255 @@ t_ACTION = r'=>'
 
 ###### SPECIAL RULES ######
 
+# Characters that can start a token, any other one begins a run of illegal characters
+token_starts = set(ignored) | { lexeme[0] for lexeme in fixed_lexemes.values() } | { '"' }
+illegal_run = re.compile('.[^A-Za-z0-9%s]*' % re.escape(''.join(sorted(token_starts))), re.S)
+
 def t_error(t):
-	print("Illegal character '{}'".format(t.value[0]))
-	t.lexer.skip(1)
+	# A whole run of illegal characters is skipped and reported once
+	run = illegal_run.match(t.lexer.lexdata, t.lexpos).group()
+	owner = getattr(t.lexer, 'owner', None)
+	if owner is None:
+		print("Illegal character '{}'".format(run))
+	else:
+		owner.report(t.lexer.lexdata, t.lexpos, run)
+	t.lexer.skip(len(run))
 
 t_ignore = ''.join(ignored)
 
 
 ###### CREATE LEXER ######
 
-lex.lex()
+master_lexer = lex.lex()
 
 ###### TOKENIZER ######
 
-def tokenizer(code):
+def line_offsets(code):
+	# `code` may also be `bytes` or an `mmap`
+	newline = '\n' if isinstance(code, str) else b'\n'
+	offsets = [0]
+	pos = code.find(newline)
+	while pos != -1:
+		offsets.append(pos + 1)
+		pos = code.find(newline, pos + 1)
+	return offsets
+
+def make_stream(code, spans, decoders=decoders):
+	tokens = TokenStream(code, token_types, decoders)
+
+	offsets = line_offsets(code)
+	last, line = len(offsets) - 1, 0
 
-	tokens = []
+	for kind, start, end in spans:
+		while line < last and offsets[line + 1] <= start:
+			line += 1
+		tokens.append(kind, start, end, line + 1, start - offsets[line])
 
-	for i, line in enumerate(code.split('\n')):
-		lex.input(line)
+	tokens.append(kind_ids['$'], len(code), len(code), last + 1, len(code) - offsets[last])
+
+	return tokens
+
+class LexicalError:
+	def __init__(self, line, column, text, length):
+		self.line = line
+		self.column = column
+		self.text = text
+		self.length = length
+
+	def __str__(self):
+		more = f' (+{self.length - len(self.text)} more)' if self.length > len(self.text) else ''
+		return f'Ln {self.line}, Col {self.column}: Illegal characters {self.text!r}{more}'
+
+	def __repr__(self):
+		return str(self)
+
+class LexerBase:
+	"""
+	State shared by the lexer backends.
+
+	Identifiers and type names are interned in `symbols`, a fresh `SymbolTable`
+	by default. Runs of illegal characters are appended to `errors` as
+	`LexicalError`s, up to `max_errors` of them, the rest are only counted in
+	`suppressed`.
+	"""
+
+	# Longest text kept for an illegal run
+	error_text = 32
+
+	def __init__(self, symbols=None, errors=None, max_errors=100):
+		self.symbols = SymbolTable() if symbols is None else symbols
+		self.decoders = symbol_decoders(self.symbols)
+		self.errors = [] if errors is None else errors
+		self.max_errors = max_errors
+		self.reported = 0
+		self.suppressed = 0
+		self.error_pos, self.error_line = 0, 1
+
+	def report(self, code, pos, run):
+		if self.reported >= self.max_errors:
+			self.suppressed += 1
+			return
+
+		# Errors come in order, lines are counted from the previous one. `find`
+		# is used since an `mmap` has no `count`
+		newline = '\n' if isinstance(code, str) else b'\n'
+		found = code.find(newline, self.error_pos, pos)
+		while found != -1:
+			self.error_line += 1
+			found = code.find(newline, found + 1, pos)
+		self.error_pos = pos
+		column = pos - code.rfind(newline, 0, pos) - 1
+
+		text = run[:self.error_text]
+		if not isinstance(text, str):
+			text = text.decode('utf-8', 'replace')
+		self.errors.append(LexicalError(self.error_line, column, text, len(run)))
+		self.reported += 1
+
+class CoolLexer(LexerBase):
+	"""
+	Reentrant COOL lexer.
+
+	Every instance owns a clone of `master_lexer`, so the rules are compiled
+	only once and several instances can tokenize concurrently.
+	"""
+
+	def __init__(self, symbols=None, errors=None, max_errors=100):
+		super().__init__(symbols, errors, max_errors)
+		self.lexer = master_lexer.clone()
+		self.lexer.owner = self
+
+	def tokenize(self, code):
+		lexer = self.lexer
+		intern = self.symbols.intern
+
+		# The whole buffer is lexed in one pass, lines and columns are recovered
+		# from the offsets where each line starts
+		offsets = line_offsets(code)
+		last, line = len(offsets) - 1, 0
+
+		lexer.input(code)
+		self.error_pos, self.error_line = 0, 1
 		while True:
-			token = lex.token()
+			token = lexer.token()
 			if token is None:
 				break
-			tokens.append(Token(token.value, tokens_dict[token.type], i + 1, token.lexpos))
+			pos = token.lexpos
+			while line < last and offsets[line + 1] <= pos:
+				line += 1
+			value = intern(token.value) if token.type in identifier_kinds else token.value
+			yield Token(value, tokens_dict[token.type], line + 1, pos - offsets[line])
+
+		yield Token('$', CoolGrammar.EOF, last + 1, len(code) - offsets[last])
+
+	def spans(self, code, pos=0):
+		"""
+		Yields (kind id, start, end) for every token of `code` from `pos` on.
+		"""
+		lexer = self.lexer
+		lexer.input(code)
+		lexer.lexpos = pos
+		self.error_pos, self.error_line = 0, 1
+		while True:
+			token = lexer.token()
+			if token is None:
+				break
+			# After a match `lexer.lexpos` is the end of the matched text
+			yield kind_ids[token.type], token.lexpos, lexer.lexpos
+
+	def stream(self, code):
+		return make_stream(code, self.spans(code), self.decoders)
 
-	tokens.append(Token('$', CoolGrammar.EOF))
-	
+	def __call__(self, code):
+		return list(self.tokenize(code))
+
+def tokenize(code):
+	"""
+	Returns (iterator of tokens, list of `LexicalError`s), the errors are added
+	as the tokens are read.
+	"""
+	lexer = CoolLexer()
+	return lexer.tokenize(code), lexer.errors
+
+def tokenizer(code):
+	"""
+	Returns (list of tokens, list of `LexicalError`s).
+	"""
+	lexer = CoolLexer()
+	return lexer(code), lexer.errors
+
+###### INCREMENTAL LEXING ######
+
+def merge_edits(first, second):
+	"""
+	Merges two consecutive edits, each one a tuple (start, removed, added),
+	into a single edit of the original text.
+	"""
+	start, removed, added = first
+	pos, removed2, added2 = second
+	old_end = max(start + removed, pos + removed2 - added + removed)
+	new_end = max(start + added, pos + removed2) - removed2 + added2
+	start = min(start, pos)
+	return start, old_end - start, new_end - start
+
+def relex(tokens, code, start, removed, added, lexer=None):
+	"""
+	Updates in place the `TokenStream` of the previous text after the `removed`
+	characters at `start` were replaced by `added` new ones, `code` being the new
+	text. Returns the same stream.
+
+	Lexing restarts at the end of the last token before the edited line and stops
+	at the first token, past the edited lines, that lines up with a previous one.
+	The tokens after it are kept and shifted, so the cost depends on the size of
+	the edit and not on the size of the text.
+	"""
+	if lexer is None:
+		lexer = CoolLexer()
+	delta = added - removed
+	count = len(tokens) - 1
+
+	# Restart point, outside any comment and before any unterminated string
+	line_start = code.rfind('\n', 0, start) + 1
+	first = tokens.bisect(line_start)
+	if first:
+		restart, pos, line = tokens.end(first - 1), tokens.start(first - 1), tokens.line(first - 1)
+	else:
+		restart, pos, line = 0, 0, 1
+
+	new_end = start + added
+	sync_from = code.find('\n', new_end)
+	if sync_from == -1:
+		sync_from = len(code)
+
+	# An unterminated '(*' is lexed as '(' and '*', closing it changes every token
+	# after it, so the whole text is lexed again with no synchronization
+	kinds, opening = tokens.kinds.tobytes(), bytes((kind_ids['('], kind_ids['*']))
+	i = kinds.find(opening, 0, first + 1)
+	while i != -1:
+		if tokens.end(i) == tokens.start(i + 1):
+			first, restart, pos, line = 0, 0, 0, 1
+			sync_from = len(code)
+			break
+		i = kinds.find(opening, i + 1, first + 1)
+
+	relexed = []
+	j = first
+	for kind, s, e in lexer.spans(code, restart):
+		line += code.count('\n', pos, s)
+		pos = s
+		if s > sync_from:
+			# Past the edited lines the old text is the same, so once a token
+			# starts where an old one did, every token after it is the same too
+			while j < count and tokens.start(j) < s - delta:
+				j += 1
+			if j < count and tokens.start(j) == s - delta and tokens.end(j) == e - delta and tokens.kinds[j] == kind:
+				tokens.splice(first, j, relexed, delta, line - tokens.line(j), code)
+				return tokens
+		relexed.append((kind, s, e, line, s - code.rfind('\n', 0, s) - 1))
+
+	line += code.count('\n', pos)
+	relexed.append((kind_ids['$'], len(code), len(code), line, len(code) - code.rfind('\n') - 1))
+	tokens.splice(first, count + 1, relexed, delta, 0, code)
 	return tokens
 
 def pprint_tokens(tokens):
@@ -168,15 +444,8 @@ if __name__ == '__main__':
 
 	sourcefile = sys.argv[1]
 
-	# Read source file
-
-	with open(sourcefile, 'r') as source:
-	    lex.input(source.read())
-
-	# Read tokens
+	# Read tokens straight from the mapped file
 
-	while True:
-	    token = lex.token()
-	    if token is None:
-	        break
-	    print(token)
+	from .dfa_lexer import DFALexer
+	for token in DFALexer().stream_file(sourcefile):
+	    print(f'{token.line}:{token.column}', token)
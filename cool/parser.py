@@ -1,4 +1,6 @@
-from .cmp import Grammar, LR1Parser
+import os
+import warnings
+from .cmp import Grammar, LR1Parser, LALR1Parser, PrecompiledParser
 
 # AST Classes
 class Node:
@@ -196,6 +198,10 @@ plus, minus, star, div, isvoid, compl = CoolGrammar.Terminals('+ - * / isvoid ~'
 notx, less, leq, equal = CoolGrammar.Terminals('not < <= =')
 new, idx, typex, integer, string, boolx = CoolGrammar.Terminals('new id type integer string bool')
 
+# tokens the parser resynchronizes on after a syntax error, `class` lets it
+# start over with the next class when a class header is broken
+CoolSynchronizing = [ semi, ccur, esac, fi, pool, classx ]
+
 # productions
 program %= class_list, lambda h, s: ProgramNode(s[1])
 
@@ -301,10 +307,72 @@ arg_list %= expr + comma + arg_list, lambda h, s: [s[1]] + s[3]
 member_call %= idx + opar + arg_list + cpar, lambda h, s: MemberCallNode(s[1], s[3])
 member_call %= idx + opar + cpar, lambda h, s: MemberCallNode(s[1], [])
 
-# parser
-CoolParser = LR1Parser(CoolGrammar)
+# parser, its tables come from the generated `cool.parsetab` module if there
+# is one (see --write-tables), otherwise they are cached next to the compiled
+# modules and built again only when the grammar changes. A `parsetab` that
+# can not be read is taken as missing
+try:
+    from . import parsetab
+    CoolParser = PrecompiledParser(CoolGrammar, parsetab)
+except (ImportError, OSError):
+    CoolParser = LR1Parser(CoolGrammar, cache=os.path.join(os.path.dirname(__file__), '__pycache__', 'CoolParser.json'))
+except ValueError as error:
+    warnings.warn(f'{error}, regenerate it with `python -m cool.parser --write-tables`')
+    CoolParser = LR1Parser(CoolGrammar, cache=os.path.join(os.path.dirname(__file__), '__pycache__', 'CoolParser.json'))
+# the chain of identity unit productions from <expr> down to <atom> is skipped
+CoolParser.shortcut_unit_productions()
+# dense rows, packing them takes less than half the memory but parses slower
+CoolParser.compile(compress=False)
 
 if __name__ == '__main__':
-    if CoolParser.is_lr1:
+
+    import argparse
+    import json
+    import time
+
+    parser = argparse.ArgumentParser(prog='python -m cool.parser')
+    parser.add_argument('--compare', action='store_true', help='build time and table size of every parser kind')
+    parser.add_argument('--write-tables', nargs='?', const=os.path.join(os.path.dirname(__file__), 'parsetab.py'),
+                        metavar='PATH', help='write the LR(1) tables as a Python module (cool/parsetab.py by default)')
+    parser.add_argument('--report', nargs='?', const='lr1', choices=('lr1', 'lalr1'),
+                        help='build the tables and report their size, conflicts and build times')
+    parser.add_argument('--json', action='store_true', help='print the report as JSON')
+    args = parser.parse_args()
+
+    if args.report:
+        report = { 'lr1': LR1Parser, 'lalr1': LALR1Parser }[args.report](CoolGrammar).report()
+        if args.json:
+            print(json.dumps(report, indent=2))
+        else:
+            print(f'{report["parser"]}: {report["terminals"]} terminals, {report["nonterminals"]} nonterminals, '
+                  f'{report["productions"]} productions')
+            print(f'states: {report["states"]}, items: {report["items"]}')
+            print(f'action: {report["action_cells"]} cells, density {report["action_density"]:.3f}')
+            print(f'goto: {report["goto_cells"]} cells, density {report["goto_density"]:.3f}')
+            print('timings: ' + ', '.join(f'{phase} {seconds:.3f}s' for phase, seconds in report['timings'].items()))
+            print(f'conflicts: {len(report["conflicts"])}')
+            for conflict in report['conflicts']:
+                print(f'  state {conflict["state"]} on {conflict["symbol"]} ({conflict["kind"]}): {", ".join(conflict["actions"])}')
+                for item in conflict.get('items', ()):
+                    print(f'      {item}')
+    elif args.write_tables:
+        LR1Parser(CoolGrammar).write_module(args.write_tables)
+        print(f'Tables written to {args.write_tables}')
+    elif args.compare:
+        print(f'{"parser":<12} {"seconds":>8} {"states":>7} {"actions":>8} {"gotos":>6} {"conflicts":>10}')
+        for kind in (LR1Parser, LALR1Parser):
+            start = time.perf_counter()
+            table = kind(CoolGrammar)
+            seconds = time.perf_counter() - start
+            print(f'{kind.__name__:<12} {seconds:>8.3f} {len(table.action):>7} {sum(map(len, table.action.values())):>8} '
+                  f'{sum(map(len, table.goto.values())):>6} {len(table.conflicts()):>10}')
+            for compress in (False, True):
+                start = time.perf_counter()
+                compiled = table.compile(compress)
+                print(f'    {"packed" if compress else "dense"}: {len(compiled.table)} cells, '
+                      f'{compiled.nbytes / 1024:.1f} KiB, compiled in {time.perf_counter() - start:.3f}s')
+            for state, symbol, cell in table.conflicts():
+                print(f'    state {state} on {symbol}: {cell}')
+    elif CoolParser.is_lr1:
         print('The grammar is LR1')
         print(CoolGrammar)
\ No newline at end of file
@@ -0,0 +1,23 @@
+import pickle
+
+from cool.batch import parse_files
+from cool.benchmark import generate
+
+
+def test_unreadable_files_are_reported(tmp_path):
+    good, broken = tmp_path / 'good.cl', tmp_path / 'broken.cl'
+    good.write_text(generate('identifiers', 2000))
+    broken.write_text('class A { x : Int <- ; };\nclass B { y : Int <- 1 #; };\n')
+    paths = [ str(good), str(tmp_path / 'missing.cl'), str(broken) ]
+
+    for workers in (1, 2):
+        results = parse_files(paths, workers)
+
+        assert [ result.path for result in results ] == paths
+        assert results[0].ok and results[0].ast is not None
+        assert results[1].error is not None and not results[1].ok
+        assert [ token.lex for token in results[2].syntax_errors ] == [ ';' ]
+        assert [ error.text for error in results[2].lexical_errors ] == [ '#' ]
+
+        # Results cross process boundaries
+        assert pickle.loads(pickle.dumps(results))[0].ast.declarations
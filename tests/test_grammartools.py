@@ -0,0 +1,110 @@
+import multiprocessing
+import random
+
+import pytest
+
+from cool import CoolLexer
+from cool.benchmark import generate
+from cool.cmp import Grammar, GrammarTools, LR1Parser, LALR1Parser
+from cool.parser import CoolGrammar
+
+
+def random_grammar(rng):
+    G = Grammar()
+    nonterminals = [ G.NonTerminal(f'N{i}', i == 0) for i in range(rng.randrange(1, 10)) ]
+    terminals = list(G.Terminals(' '.join(f't{i}' for i in range(rng.randrange(1, 6)))))
+    for X in nonterminals:
+        for _ in range(rng.randrange(1, 4)):
+            symbols = [ rng.choice(nonterminals + terminals) for _ in range(rng.randrange(4)) ]
+            if not symbols:
+                X %= G.Epsilon
+            else:
+                sentence = symbols[0]
+                for symbol in symbols[1:]:
+                    sentence = sentence + symbol
+                X %= sentence
+    return G
+
+def cells(parser):
+    action = { (state, symbol.Name): [ str(a) for a in cell ] for state, row in parser.action.items() for symbol, cell in row.items() }
+    goto = { (state, symbol.Name): cell for state, row in parser.goto.items() for symbol, cell in row.items() }
+    return action, goto
+
+
+###### FIRST/FOLLOW ######
+
+def same_sets(expected, computed):
+    assert expected.keys() == computed.keys()
+    for key in expected:
+        assert expected[key].set == computed[key].set, key
+        assert expected[key].contains_epsilon == computed[key].contains_epsilon, key
+
+def test_bitset_first_follow():
+    rng = random.Random(1)
+    grammars = [ CoolGrammar, CoolGrammar.AugmentedGrammar(True) ] + [ random_grammar(rng) for _ in range(200) ]
+    for G in grammars:
+        firsts = GrammarTools.compute_firsts(G)
+        same_sets(firsts, GrammarTools.compute_firsts_fast(G))
+        same_sets(GrammarTools.compute_follows(G, firsts), GrammarTools.compute_follows_fast(G))
+
+def test_terminal_bits_match_item_lookaheads():
+    # One layout for every bitset of terminals, epsilon keeps bit 0
+    bits = GrammarTools.terminal_bits(CoolGrammar)
+    terminals = GrammarTools.terminals_by_id(CoolGrammar)
+    assert terminals[0] is None and terminals[1] is CoolGrammar.EOF
+    for terminal, bit in bits.items():
+        assert GrammarTools.terminals_of(bit, terminals) == [ terminal ]
+    assert not any(bit & GrammarTools.EPSILON for bit in bits.values())
+
+
+###### LALR(1) ######
+
+def test_lalr_conflicts_of_merged_states():
+    # LR(1) but not LALR(1), merging the states of `c` gives reduce/reduce conflicts
+    G = Grammar()
+    S = G.NonTerminal('S', True)
+    A, B = G.NonTerminals('A B')
+    a, b, c, d, e = G.Terminals('a b c d e')
+    S %= a + A + d | b + B + d | a + B + e | b + A + e
+    A %= c
+    B %= c
+
+    lr1 = LR1Parser(G)
+    assert lr1.is_lr1 and not lr1.conflicts()
+
+    lalr = LALR1Parser(G)
+    assert not lalr.is_lr1
+    conflicts = lalr.conflicts()
+    assert sorted(symbol.Name for _, symbol, _ in conflicts) == [ 'd', 'e' ]
+    assert all({ kind for kind, _ in cell } == { 'REDUCE' } for _, _, cell in conflicts)
+
+def test_lalr_keeps_lr1_conflicts():
+    rng = random.Random(0)
+    for _ in range(100):
+        G = random_grammar(rng)
+        lr1, lalr = LR1Parser(G), LALR1Parser(G)
+        # Merging states can add conflicts, never remove them
+        if not lr1.is_lr1:
+            assert not lalr.is_lr1
+        assert lalr.is_lr1 == (not lalr.conflicts())
+
+def test_cool_lalr_parses_as_lr1():
+    lr1, lalr = LR1Parser(CoolGrammar), LALR1Parser(CoolGrammar)
+    assert lalr.is_lr1 and not lalr.conflicts()
+    assert len(lalr.action) < len(lr1.action)
+
+    tokens = CoolLexer()(generate('identifiers', 20000) + generate('long-lines', 20000))
+    assert lalr(tokens) == lr1(tokens)
+
+
+###### PARALLEL CONSTRUCTION ######
+
+@pytest.mark.skipif('fork' not in multiprocessing.get_all_start_methods(), reason='the parallel build needs fork')
+def test_parallel_tables_match_serial():
+    rng = random.Random(2)
+    grammars = [ CoolGrammar ] + [ random_grammar(rng) for _ in range(20) ]
+    for G in grammars:
+        serial, parallel = LR1Parser(G), LR1Parser(G, workers=2)
+        # Conflicting cells list their actions in the same order too
+        assert cells(parallel) == cells(serial)
+        assert parallel.is_lr1 == serial.is_lr1
@@ -0,0 +1,87 @@
+import random
+from concurrent.futures import ThreadPoolExecutor
+
+from cool import CoolLexer, DFALexer, relex, tokenizer
+from cool.benchmark import CORPORA, generate
+
+
+def tokens_of(code):
+    return [ (token.lex, token.token_type, token.line, token.column) for token in CoolLexer()(code) ]
+
+def test_concurrent_tokenization_matches_serial():
+    # Every instance lexes with its own clone of the master lexer
+    sources = [ generate(corpus, 1 << 14, seed) for corpus in CORPORA for seed in range(6) ]
+    serial = [ tokens_of(code) for code in sources ]
+
+    with ThreadPoolExecutor(8) as pool:
+        concurrent = list(pool.map(tokens_of, sources))
+
+    assert concurrent == serial
+
+
+def test_stream_file_reports_illegal_bytes(tmp_path):
+    # Lines of errors in a mapped file are counted without `count`, which an
+    # `mmap` lacks
+    source = tmp_path / 'illegal.cl'
+    source.write_bytes(b'class A {\n  x : Int <- 1 # 2;\n  y : Int <- \x01 3;\n};\n')
+
+    lexer = DFALexer()
+    tokens = list(lexer.stream_file(str(source)))
+
+    assert [ (error.line, error.column, error.text) for error in lexer.errors ] == [ (2, 15, '#'), (3, 13, '\x01') ]
+    assert [ token.lex for token in tokens ][-3:] == [ '}', ';', '$' ]
+
+    expected = CoolLexer()
+    expected(source.read_text())
+    assert [ (error.line, error.column) for error in lexer.errors ] == [ (error.line, error.column) for error in expected.errors ]
+
+def test_unterminated_block_comments():
+    # '(*' with no '*)' after it is lexed as '(' and '*', by both backends
+    code = 'a (* b *) c (* (* d *) e *) f (* g\n' + 'x (* y\n' * 2000
+    expected = [ 'a', 'c', 'e', '*', ')', 'f', '(', '*', 'g' ] + [ 'x', '(', '*', 'y' ] * 2000 + [ '$' ]
+
+    for lexer in (CoolLexer(), DFALexer()):
+        assert [ token.lex for token in lexer(code) ] == expected
+
+
+def stream_tokens(tokens):
+    return [ (token.lex, token.token_type, token.line, token.column) for token in tokens ]
+
+def random_edit(rng, code):
+    start = rng.randrange(len(code) + 1)
+    removed = min(rng.randrange(8), len(code) - start)
+    text = ''.join(rng.choice([ 'x', 'Int', ' ', '\n', ';', '(*', '*)', '--', '"', '1', '<-' ]) for _ in range(rng.randrange(4)))
+    return code[:start] + text + code[start + removed:], (start, removed, len(text))
+
+def test_relex_matches_full_lexing():
+    rng = random.Random(0)
+    for lexer in (CoolLexer(), DFALexer()):
+        code = generate('identifiers', 2000) + generate('comments', 1000)
+        tokens = lexer.stream(code)
+        for _ in range(300):
+            code, edit = random_edit(rng, code)
+            # The stream is always updated in place
+            assert relex(tokens, code, *edit, lexer=lexer) is tokens
+            assert stream_tokens(tokens) == stream_tokens(lexer.stream(code))
+
+def test_pending_shifts():
+    rng = random.Random(1)
+    code = generate('long-lines', 3000)
+    lexer = CoolLexer()
+    tokens = lexer.stream(code)
+    tokens.max_shifts = 1 << 30
+    for _ in range(50):
+        code, edit = random_edit(rng, code)
+        relex(tokens, code, *edit, lexer=lexer)
+    assert tokens.shifts
+
+    # Applying the shifts leaves the tokens as they were read with them pending
+    pending = stream_tokens(tokens)
+    tokens.apply_shifts()
+    assert not tokens.shifts
+    assert stream_tokens(tokens) == pending == stream_tokens(lexer.stream(code))
+
+def test_tokenizer_returns_errors():
+    tokens, errors = tokenizer('class A { x : Int <- 1 # 2; };\n\x01\x02 ')
+    assert tokens[-1].lex == '$'
+    assert [ (error.line, error.column, error.text, error.length) for error in errors ] == [ (1, 23, '#', 1), (2, 0, '\x01\x02', 2) ]
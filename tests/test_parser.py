@@ -0,0 +1,61 @@
+import random
+
+from cool import CoolLexer, FormatVisitor
+from cool.benchmark import CORPORA, generate
+from cool.cmp import LR1Parser
+from cool.parser import CoolGrammar, CoolParser, CoolSynchronizing
+
+
+def corpus_tokens():
+    return CoolLexer()(''.join(generate(corpus, 6000, seed) for corpus in CORPORA for seed in range(2)))
+
+def corrupt(rng, tokens, count):
+    tokens = list(tokens)
+    for i in sorted(rng.sample(range(len(tokens) - 1), count), reverse=True):
+        operation = rng.randrange(3)
+        if operation == 0:
+            del tokens[i]
+        elif operation == 1:
+            tokens.insert(i, tokens[rng.randrange(len(tokens) - 1)])
+        else:
+            tokens[i] = tokens[rng.randrange(len(tokens) - 1)]
+    return tokens
+
+
+###### ERROR RECOVERY ######
+
+def test_recover_without_errors():
+    assert CoolParser.recover(corpus_tokens(), CoolSynchronizing) == []
+
+def test_recover_reports_first_error_first():
+    rng = random.Random(0)
+    tokens = corpus_tokens()
+    for _ in range(100):
+        corrupted = corrupt(rng, tokens, rng.randrange(1, 8))
+        _, unexpected = CoolParser.evaluate(corrupted)
+        errors = CoolParser.recover(corrupted, CoolSynchronizing)
+        # The first error reported is the one the plain parser stops at
+        if unexpected is None:
+            assert errors == []
+        else:
+            assert errors and errors[0] is unexpected
+
+
+###### UNIT PRODUCTIONS ######
+
+def test_unit_shortcut_keeps_ast_and_errors():
+    # `CoolParser` skips the identity unit productions, `plain` does not
+    plain = LR1Parser(CoolGrammar)
+    tokens = corpus_tokens()
+
+    ast, _ = CoolParser.evaluate(tokens)
+    expected, _ = plain.evaluate(tokens)
+    assert FormatVisitor().visit(ast) == FormatVisitor().visit(expected)
+    assert len(CoolParser(tokens)[0]) < len(plain(tokens)[0])
+
+    rng = random.Random(1)
+    for _ in range(100):
+        corrupted = corrupt(rng, tokens, rng.randrange(1, 8))
+        # Errors are found on the same tokens
+        assert CoolParser.evaluate(corrupted)[1] is plain.evaluate(corrupted)[1]
+        assert CoolParser.recover(corrupted, CoolSynchronizing) == plain.recover(corrupted, CoolSynchronizing)
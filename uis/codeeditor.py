@@ -2,6 +2,8 @@ from PyQt5.QtWidgets import QWidget, QPlainTextEdit, QApplication, QTextEdit
 from PyQt5.QtGui import QColor, QTextFormat, QPainter
 from PyQt5.QtCore import QRect, pyqtSlot, Qt
 
+from cool import merge_edits
+
 
 class LineNumberArea(QWidget):
     def __init__(self, editor):
@@ -21,6 +23,8 @@ class CodeEditor(QPlainTextEdit):
         self.blockCountChanged.connect(self.updateLineNumberAreaWidth)
         self.updateRequest.connect(self.updateLineNumberArea)
         self.cursorPositionChanged.connect(self.highlightCurrentLine)
+        self.edit = None
+        self.document().contentsChange.connect(self.recordEdit)
         self.updateLineNumberAreaWidth(0)
         self.highlightCurrentLine()
 
@@ -72,6 +76,16 @@ class CodeEditor(QPlainTextEdit):
             extraSelections.append(selection)
         self.setExtraSelections(extraSelections)
 
+    @pyqtSlot(int, int, int)
+    def recordEdit(self, position, charsRemoved, charsAdded):
+        edit = (position, charsRemoved, charsAdded)
+        self.edit = edit if self.edit is None else merge_edits(self.edit, edit)
+
+    def takeEdit(self):
+        # (start, removed, added) covering every change since the last call
+        edit, self.edit = self.edit, None
+        return edit
+
     @pyqtSlot(QRect, int)
     def updateLineNumberArea(self, rect, dy):
         if dy: